@@ -0,0 +1,159 @@
+import streamlit as st
+import pandas as pd
+from reverse_tutor import analytics
+from reverse_tutor.export import connect, iter_sessions, read_archive, stored_personas
+from reverse_tutor.grading import SCORE_MAX
+from reverse_tutor.personas import PERSONAS
+from reverse_tutor.store import DEFAULT_DB_PATH
+from datetime import date, datetime, timedelta
+import os
+import tempfile
+
+# ========== CONFIGURATION & AUTHENTICATION ==========
+st.set_page_config(page_title="Reverse Tutor — Instructor Dashboard", layout="wide")
+
+if "INSTRUCTOR_PASSWORD" not in st.secrets:
+    st.error("Missing INSTRUCTOR_PASSWORD in secrets.")
+    st.stop()
+
+
+def check_password():
+    def password_entered():
+        if st.session_state["password"] == st.secrets["INSTRUCTOR_PASSWORD"]:
+            st.session_state["password_correct"] = True
+            del st.session_state["password"]
+        else:
+            st.session_state["password_correct"] = False
+
+    if "password_correct" not in st.session_state:
+        st.text_input("Please enter the instructor password", type="password",
+                       on_change=password_entered, key="password")
+        return False
+    elif not st.session_state["password_correct"]:
+        st.text_input("Please enter the instructor password", type="password",
+                       on_change=password_entered, key="password")
+        st.error("😕 Password incorrect")
+        return False
+    return True
+
+
+if not check_password():
+    st.stop()
+
+# ========== LOADING ==========
+# Sessions are parsed into columns once per source (reverse_tutor/analytics.py).
+# From the store only the chosen persona and date range are read, and only the
+# fields the analytics use; an archive is loaded whole and filtered with NumPy masks.
+@st.cache_resource(ttl=60, show_spinner=False)
+def load_store_personas(db_path):
+    conn = connect(db_path)
+    try:
+        return stored_personas(conn)
+    finally:
+        conn.close()
+
+
+@st.cache_resource(ttl=60, max_entries=16, show_spinner="Loading sessions...")
+def load_store(db_path, persona_key, since, until):
+    conn = connect(db_path)
+    try:
+        records = iter_sessions(conn, persona_key, since, until, fields=analytics.RECORD_FIELDS)
+        return analytics.SessionTable.from_records(PERSONAS[persona_key], records)
+    finally:
+        conn.close()
+
+
+@st.cache_resource(max_entries=4, show_spinner="Loading archive...")
+def load_archive(name, data):
+    suffix = ".parquet" if name.endswith(".parquet") else ".jsonl"
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        f.write(data)
+    try:
+        return analytics.load_tables(read_archive(f.name))
+    finally:
+        os.unlink(f.name)
+
+
+with st.sidebar:
+    st.header("Sessions")
+    source = st.radio("Source", ["Session store", "Exported archive"])
+    db_path = st.secrets.get("SESSION_DB_PATH", DEFAULT_DB_PATH)
+    try:
+        if source == "Session store":
+            available = load_store_personas(db_path)
+        else:
+            upload = st.file_uploader("Archive from reverse_tutor.export", type=["jsonl", "parquet"])
+            if upload is None:
+                st.info("Upload a .jsonl or .parquet archive.")
+                st.stop()
+            tables = load_archive(upload.name, upload.getvalue())
+            available = tables.keys()
+    except Exception as e:
+        st.error(f"Could not load sessions: {e}")
+        st.stop()
+
+    graded = [key for key in PERSONAS if key in available and PERSONAS[key].grade_categories]
+    if not graded:
+        st.info("No graded sessions yet.")
+        st.stop()
+    persona_key = st.selectbox("Persona", graded, format_func=lambda k: PERSONAS[k].name)
+    today = date.today()
+    days = st.date_input("Created between", (today - timedelta(days=30), today))
+    first, last = days if isinstance(days, tuple) and len(days) == 2 else (None, None)
+
+    if source == "Session store":
+        try:
+            table = load_store(db_path, persona_key, first, last)
+        except Exception as e:
+            st.error(f"Could not load sessions: {e}")
+            st.stop()
+    else:
+        table = tables[persona_key]
+        if first is not None:
+            since = datetime.combine(first, datetime.min.time()).timestamp()
+            until = datetime.combine(last + timedelta(days=1), datetime.min.time()).timestamp()
+            table = table.between(since, until)
+
+# ========== DASHBOARD ==========
+st.title(f"📊 {PERSONAS[persona_key].name} — class overview")
+if not len(table):
+    st.info("No sessions in this date range.")
+    st.stop()
+
+
+def _fmt(value, spec):
+    return "—" if value != value else format(value, spec)      # NaN check
+
+
+summary = analytics.summary(table)
+c1, c2, c3, c4, c5 = st.columns(5)
+c1.metric("Sessions", summary["sessions"])
+c2.metric("Concession rate", _fmt(summary["concession_rate"] * 100, ".0f") + "%")
+c3.metric("Median messages to concede", _fmt(summary["median_turns_to_concede"], ".0f"))
+c4.metric("Mean total score", _fmt(summary["mean_total"], ".1f"))
+c5.metric("Mean hints used", _fmt(summary["mean_hints"], ".1f"))
+
+st.subheader("Score distribution by category")
+distributions = analytics.score_distributions(table)
+st.bar_chart(pd.DataFrame(distributions, index=pd.Index(range(1, SCORE_MAX + 1), name="Score")),
+             stack=False)
+
+left, right = st.columns(2)
+with left:
+    st.subheader("Student messages to concession")
+    turns = analytics.concession_turns(table)
+    st.bar_chart(pd.DataFrame({"Sessions": turns}, index=pd.Index(range(len(turns)), name="Messages")))
+with right:
+    st.subheader("Hints used vs. total score")
+    hints, sessions, scored, mean = analytics.hints_vs_score(table)
+    by_hints = pd.DataFrame({"Hints used": hints, "Sessions": sessions, "Graded": scored, "Mean total": mean})
+    st.dataframe(by_hints[by_hints["Sessions"] > 0].round(2), hide_index=True, width="stretch")
+
+if len(table.contexts) > 1 or table.contexts[0]:
+    st.subheader("By scenario")
+    breakdown = pd.DataFrame(analytics.breakdown(table)).rename(columns={
+        "context": "Scenario", "sessions": "Sessions", "concession_rate": "Concession rate",
+        "mean_total": "Mean total",
+    })
+    breakdown = breakdown[breakdown["Sessions"] > 0]
+    st.dataframe(breakdown.round(2), hide_index=True, width="stretch")
@@ -0,0 +1 @@
+"""Shared plumbing for the Reverse Tutor bot apps."""
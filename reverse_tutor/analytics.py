@@ -0,0 +1,194 @@
+"""Class-wide analytics over stored or exported sessions.
+
+Rubric scores used to exist only inside one student's session. `load_tables`
+reads session records (from the store via `reverse_tutor.export.iter_sessions`,
+asking only for RECORD_FIELDS, or from an archive via `read_archive`) into one
+`SessionTable` per persona: a NumPy array per field, one row per session.
+From the store the student messages are counted in SQLite, so no transcript is
+read into Python; an archive's are counted from its conversations. Everything
+else here is a handful of vectorized reductions over those columns, so a
+dashboard can re-filter tens of thousands of sessions on every widget change:
+
+- `score_distributions`: how often each score 1..SCORE_MAX was given, per
+  rubric category;
+- `concession_turns`: how many student messages it took to win the debate;
+- `hints_vs_score`: mean total score by number of hints used;
+- `breakdown`: sessions, concession rate and mean scores per context, e.g.
+  per Boris scenario.
+
+Scores that are missing (not conceded yet, or a persona graded only in
+character) are NaN and left out of the means.
+"""
+import numpy as np
+
+from reverse_tutor.bots import HINT_PLACEHOLDER_PATTERN
+from reverse_tutor.export import session_scores
+from reverse_tutor.grading import SCORE_MAX
+from reverse_tutor.personas import get_persona
+
+# The session record fields the tables are built from.
+RECORD_FIELDS = ("persona", "context", "created", "bot_conceded", "hints_used", "scores", "grade_response",
+                 "student_turns", "concession_turn")
+
+
+def _student_turns(record):
+    """Student messages up to the conceding reply, and in total; the first is None if it never conceded."""
+    if "student_turns" in record:
+        return record["concession_turn"], record["student_turns"]
+    concession = get_persona(record["persona"]).concession
+    turns, conceded_at, hint_reply = 0, None, False
+    for turn in record["conversation"]:
+        if turn["role"] == "user":
+            hint_reply = bool(HINT_PLACEHOLDER_PATTERN.fullmatch(turn["content"]))
+            turns += turn["seq"] > 0 and not hint_reply      # seq 0 is the opening trigger
+        elif (conceded_at is None and record["bot_conceded"] and not hint_reply
+                and concession(turn["content"])):
+            conceded_at = turns
+    return conceded_at, turns
+
+
+class SessionTable:
+    """One persona's sessions as columns.
+
+    `scores` is an (n, len(categories)) float array with NaN for missing
+    scores; `context` holds codes into `contexts`.
+    """
+
+    def __init__(self, persona, created, conceded, hints, turns, concession_turn, scores, context, contexts):
+        self.persona = persona
+        self.categories = list(persona.grade_categories or ())
+        self.created = created                  # float64, epoch seconds
+        self.conceded = conceded                # bool
+        self.hints = hints                      # int16
+        self.turns = turns                      # int16, student messages in the session
+        self.concession_turn = concession_turn  # int16, student messages before conceding; -1 if not conceded
+        self.scores = scores                    # float32 (n, categories)
+        self.context = context                  # int32 codes into `contexts`
+        self.contexts = contexts
+
+    def __len__(self):
+        return len(self.created)
+
+    @classmethod
+    def from_records(cls, persona, records):
+        categories = list(persona.grade_categories or ())
+        created, conceded, hints, turns, concession_turn, scores, contexts = [], [], [], [], [], [], []
+        for record in records:
+            conceded_at, total_turns = _student_turns(record)
+            session = session_scores(record) or {}
+            created.append(record["created"].timestamp())
+            conceded.append(bool(record["bot_conceded"]))
+            hints.append(record["hints_used"])
+            turns.append(total_turns)
+            concession_turn.append(-1 if conceded_at is None else conceded_at)
+            scores.append([session.get(cat, np.nan) for cat in categories])
+            contexts.append(record["context"] or "")
+        labels, codes = np.unique(np.array(contexts, dtype=str), return_inverse=True)
+        return cls(
+            persona,
+            np.array(created, dtype=np.float64),
+            np.array(conceded, dtype=bool),
+            np.array(hints, dtype=np.int16),
+            np.array(turns, dtype=np.int16),
+            np.array(concession_turn, dtype=np.int16),
+            np.array(scores, dtype=np.float32).reshape(len(created), len(categories)),
+            codes.astype(np.int32),
+            labels.tolist(),
+        )
+
+    def select(self, mask):
+        """The rows where the boolean `mask` is true."""
+        return SessionTable(self.persona, self.created[mask], self.conceded[mask], self.hints[mask],
+                            self.turns[mask], self.concession_turn[mask], self.scores[mask],
+                            self.context[mask], self.contexts)
+
+    def between(self, since=None, until=None):
+        """Sessions created in [since, until) (epoch seconds; None for open ends)."""
+        mask = np.ones(len(self), dtype=bool)
+        if since is not None:
+            mask &= self.created >= since
+        if until is not None:
+            mask &= self.created < until
+        return self.select(mask)
+
+    @property
+    def total(self):
+        """Total score per session; NaN unless every category was scored."""
+        if not self.categories:
+            return np.full(len(self), np.nan, dtype=np.float32)
+        return self.scores.sum(axis=1)
+
+
+def load_tables(records):
+    """{persona key: SessionTable} for an iterable of session records."""
+    grouped = {}
+    for record in records:
+        grouped.setdefault(record["persona"], []).append(record)
+    return {key: SessionTable.from_records(get_persona(key), rows) for key, rows in grouped.items()}
+
+
+def _mean(values):
+    return float(np.nanmean(values)) if np.any(~np.isnan(values)) else float("nan")
+
+
+def summary(table):
+    conceded = table.concession_turn[table.concession_turn >= 0]
+    return {
+        "sessions": len(table),
+        "concession_rate": float(table.conceded.mean()) if len(table) else float("nan"),
+        "median_turns_to_concede": float(np.median(conceded)) if len(conceded) else float("nan"),
+        "mean_total": _mean(table.total),
+        "mean_hints": float(table.hints.mean()) if len(table) else float("nan"),
+    }
+
+
+def score_distributions(table):
+    """{category: counts of scores 1..SCORE_MAX} (index 0 is a score of 1)."""
+    result = {}
+    for i, cat in enumerate(table.categories):
+        column = table.scores[:, i]
+        scored = column[~np.isnan(column)].astype(np.int64)
+        result[cat] = np.bincount(np.clip(scored, 1, SCORE_MAX) - 1, minlength=SCORE_MAX)
+    return result
+
+
+def concession_turns(table):
+    """Counts of sessions by the number of student messages it took to concede (index = messages)."""
+    conceded = table.concession_turn[table.concession_turn >= 0].astype(np.int64)
+    return np.bincount(conceded) if len(conceded) else np.zeros(1, dtype=np.int64)
+
+
+def hints_vs_score(table):
+    """(hints used, sessions, scored sessions, mean total score) arrays, one entry per hint count."""
+    hints = table.hints.astype(np.int64)
+    if not len(hints):
+        empty = np.zeros(0)
+        return empty, empty, empty, empty
+    total = table.total
+    scored = ~np.isnan(total)
+    sessions = np.bincount(hints)
+    graded = np.bincount(hints[scored], minlength=len(sessions))
+    sums = np.bincount(hints[scored], weights=total[scored], minlength=len(sessions))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(graded > 0, sums / np.maximum(graded, 1), np.nan)
+    return np.arange(len(sessions)), sessions, graded, mean
+
+
+def breakdown(table):
+    """Per context: {"context", "sessions", "concession_rate", "mean_total", <category means>} columns."""
+    groups = len(table.contexts)
+    sessions = np.bincount(table.context, minlength=groups)
+    conceded = np.bincount(table.context, weights=table.conceded, minlength=groups)
+    columns = {
+        "context": np.array(table.contexts, dtype=object),
+        "sessions": sessions,
+        "concession_rate": conceded / np.maximum(sessions, 1),
+    }
+    for name, values in [("mean_total", table.total)] + [
+            (cat, table.scores[:, i]) for i, cat in enumerate(table.categories)]:
+        scored = ~np.isnan(values)
+        sums = np.bincount(table.context[scored], weights=values[scored], minlength=groups)
+        counts = np.bincount(table.context[scored], minlength=groups)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            columns[name] = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return columns
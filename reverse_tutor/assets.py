@@ -0,0 +1,168 @@
+"""Static stylesheets and fonts for the apps.
+
+Celeste, Ben and Boris used to inject a few hundred lines of `<style>` with
+`st.markdown` on every rerun, plus a Google Fonts `@import` that the offline lab
+network cannot reach. Their CSS now lives in `reverse_tutor/styles/` and is
+built once per process into a minified bundle whose file name carries a hash
+of its content:
+
+    static/css/celeste.3f9a1c0b2d.css
+
+Streamlit serves `static/` at `app/static/` (`enableStaticServing` in
+`.streamlit/config.toml`), so a rerun only sends a `<link>` to the bundle and
+the browser fetches it once. A changed stylesheet gets a new name, which makes
+it safe for a reverse proxy to cache `app/static/` responses for as long as it
+likes; Streamlit itself only sends ETag and Last-Modified. Older bundles are
+left in place, so pages still open from before a deploy keep their styles;
+clear `static/css/` in the deploy step if they pile up.
+
+Fonts are served from `static/fonts/` as well. Source Sans 3 is copied from the
+Streamlit package, which already ships it. Other families are picked up from
+`reverse_tutor/fonts/` if their `.woff2` files (OFL-licensed, from Google
+Fonts) are put there under the names in FONTS. Without them the CSS font
+stacks fall back to system fonts, so nothing is fetched from outside the lab
+network. Where Google Fonts can be reached, set `REMOTE_FONTS = true` in
+`.streamlit/secrets.toml` to import the missing families from there instead,
+as the apps did before.
+
+Build every bundle ahead of time (e.g. in a deploy step) with:
+
+    python -m reverse_tutor.assets [--remote-fonts]
+"""
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+
+import streamlit as st
+
+from reverse_tutor.clients import setting
+
+STYLES_DIR = Path(__file__).resolve().parent / "styles"
+FONTS_DIR = Path(__file__).resolve().parent / "fonts"
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"   # next to the app scripts
+STATIC_URL = "app/static"
+STREAMLIT_MEDIA_DIR = Path(st.__file__).resolve().parent / "static" / "static" / "media"
+
+# (family, style, weight range, file in static/fonts, bundled Streamlit file pattern or None)
+FONTS = [
+    ("Source Sans 3", "normal", "200 900", "SourceSans3-Upright.woff2", "SourceSansVF-Upright*.woff2"),
+    ("Source Sans 3", "italic", "200 900", "SourceSans3-Italic.woff2", "SourceSansVF-Italic*.woff2"),
+    ("JetBrains Mono", "normal", "100 800", "JetBrainsMono.woff2", None),
+    ("Syne", "normal", "400 800", "Syne.woff2", None),
+    ("DM Sans", "normal", "100 1000", "DMSans.woff2", None),
+    ("DM Sans", "italic", "100 1000", "DMSans-Italic.woff2", None),
+]
+# Google Fonts css2 family specs for the families not shipped with Streamlit.
+REMOTE_FONTS = {
+    "JetBrains Mono": "JetBrains+Mono:wght@400;600",
+    "Syne": "Syne:wght@400;600;700;800",
+    "DM Sans": "DM+Sans:ital,wght@0,300;0,400;0,500;1,300",
+}
+REMOTE_FONTS_URL = "https://fonts.googleapis.com/css2"
+
+_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_SPACE = re.compile(r"\s+")
+_AROUND_PUNCT = re.compile(r"\s*([{};,>])\s*")
+
+
+def minify(css):
+    """Strip comments and the whitespace the browser ignores."""
+    css = _COMMENT.sub("", css)
+    css = _SPACE.sub(" ", css)
+    css = _AROUND_PUNCT.sub(r"\1", css)
+    css = re.sub(r":\s+", ":", css)     # also `a:hover`; a descendant `a :hover` is not used here
+    return css.replace(";}", "}").strip()
+
+
+def _write_atomic(path, data):
+    # Several app processes may build the same bundle at once.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+def _font_source(file_name, bundled):
+    local = FONTS_DIR / file_name
+    if local.is_file():
+        return local
+    if bundled:
+        return next(STREAMLIT_MEDIA_DIR.glob(bundled), None)
+    return None
+
+
+def install_fonts():
+    """Copy the available font files into static/fonts; returns the FONTS entries that have one."""
+    installed = []
+    for font in FONTS:
+        file_name, bundled = font[3], font[4]
+        target = STATIC_DIR / "fonts" / file_name
+        if not target.is_file():
+            source = _font_source(file_name, bundled)
+            if source is None:
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(source, target)
+        installed.append(font)
+    return installed
+
+
+def font_faces(fonts):
+    return "".join(
+        f"@font-face{{font-family:'{family}';font-style:{style};font-weight:{weight};"
+        f"font-display:swap;src:url('../fonts/{file_name}') format('woff2')}}"
+        for family, style, weight, file_name, _ in fonts
+    )
+
+
+def font_import(fonts):
+    """An `@import` of the REMOTE_FONTS families missing from `fonts`, or "" if none are."""
+    local = {font[0] for font in fonts}
+    missing = [spec for family, spec in REMOTE_FONTS.items() if family not in local]
+    if not missing:
+        return ""
+    return f"@import url('{REMOTE_FONTS_URL}?{'&'.join(f'family={spec}' for spec in missing)}&display=swap');"
+
+
+def build_stylesheet(name, remote_fonts=False):
+    """Write the minified bundle for `styles/<name>.css` (if not there yet) and return its URL."""
+    fonts = install_fonts()
+    css = ((font_import(fonts) if remote_fonts else "") + font_faces(fonts)
+           + minify((STYLES_DIR / f"{name}.css").read_text(encoding="utf-8")))
+    data = css.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    path = STATIC_DIR / "css" / f"{name}.{digest}.css"
+    if not path.is_file():
+        _write_atomic(path, data)
+    return f"{STATIC_URL}/css/{path.name}"
+
+
+@st.cache_resource(show_spinner=False)
+def _stylesheet_url(name, remote_fonts):
+    return build_stylesheet(name, remote_fonts)
+
+
+def stylesheet(name):
+    """Link the app's stylesheet bundle into the page, building it on first use in this process."""
+    url = _stylesheet_url(name, setting("REMOTE_FONTS", False))
+    st.markdown(f'<link rel="stylesheet" href="{url}">', unsafe_allow_html=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the apps' static stylesheet bundles.")
+    parser.add_argument("names", nargs="*", help="stylesheets in reverse_tutor/styles (default: all)")
+    parser.add_argument("--remote-fonts", action="store_true",
+                        help="import missing fonts from Google Fonts (REMOTE_FONTS = true)")
+    args = parser.parse_args(argv)
+    for name in args.names or sorted(p.stem for p in STYLES_DIR.glob("*.css")):
+        print(build_stylesheet(name, args.remote_fonts))
+
+
+if __name__ == "__main__":
+    main()
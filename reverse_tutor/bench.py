@@ -0,0 +1,229 @@
+"""Headless load generator and benchmark for the bot apps.
+
+Each simulated student is a Streamlit `AppTest` session that logs in and sends
+a scripted series of arguments. AppTest keeps a process-global runtime, so
+every student runs in its own worker process; they all talk to the same LLM
+backend at once. That backend is the local stand-in from
+`reverse_tutor.mock_server`, started in the parent process, or any
+OpenAI-compatible endpoint given with --base-url.
+
+Reported per app:
+
+- turn latency p50/p95/p99: wall time from submitting a message to the script
+  settling, reruns included;
+- render time p50/p95: a plain rerun of the finished session with no input,
+  which is the cost of redrawing the whole transcript;
+- reruns per turn: script executions per chat message (counted through a
+  wrapped `st.set_page_config`, which every app calls first);
+- memory per session: traced Python allocations still alive at the end of a
+  session, measured after a warm-up session in the same worker has paid for
+  imports and process-wide caches;
+- throughput: chat turns completed per second across all students.
+
+    python -m reverse_tutor.bench Celeste.py "Better Barrier Borris.py" --students 8 --turns 6
+    python -m reverse_tutor.bench Celeste.py --save bench/baseline.json
+    python -m reverse_tutor.bench Celeste.py --compare bench/baseline.json --tolerance 0.2
+
+With --compare the exit status is 1 if any tracked metric got worse than the
+baseline by more than the tolerance.
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from reverse_tutor import mock_server
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_PASSWORD = "bench"
+RUN_COUNTER = "_bench_script_runs"
+SCRIPT_TIMEOUT = 120
+
+STUDENT_ARGUMENTS = [
+    "I don't think that's right. Can you explain the evidence behind your claim?",
+    "Consider what happens in a completely different setting — your explanation predicts something we don't observe.",
+    "The mechanism you describe would need energy or transport that simply isn't there.",
+    "Experiments measured this directly, and the numbers contradict your view.",
+    "Put those points together: every step you rely on has a counterexample.",
+    "I think that's enough evidence. Will you concede?",
+]
+
+# Lower is better for all of these; --compare fails when one grows past the tolerance.
+TRACKED_METRICS = ("turn_p50_ms", "turn_p95_ms", "render_p95_ms", "reruns_per_turn", "memory_per_session_kb")
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _count_script_runs():
+    """Wrap `st.set_page_config` so each script execution bumps a counter in session state."""
+    original = st.set_page_config
+    if getattr(original, "_bench_wrapped", False):
+        return
+
+    def set_page_config(*args, **kwargs):
+        st.session_state[RUN_COUNTER] = st.session_state.get(RUN_COUNTER, 0) + 1
+        return original(*args, **kwargs)
+
+    set_page_config._bench_wrapped = True
+    st.set_page_config = set_page_config
+
+
+def _script_runs(at):
+    return at.session_state[RUN_COUNTER] if RUN_COUNTER in at.session_state else 0
+
+
+def _session(app_path, base_url, turns):
+    at = AppTest.from_file(app_path, default_timeout=SCRIPT_TIMEOUT)
+    at.secrets["OPENAI_API_KEY"] = "sk-bench"
+    at.secrets["APP_PASSWORD"] = BENCH_PASSWORD
+    at.secrets["OPENAI_BASE_URL"] = base_url
+    at.run()
+    at.text_input(key="password").set_value(BENCH_PASSWORD).run()
+
+    turn_ms, reruns, errors = [], [], 0
+    for i in range(turns):
+        if not at.chat_input:
+            break
+        before = _script_runs(at)
+        start = time.perf_counter()
+        at.chat_input[0].set_value(STUDENT_ARGUMENTS[i % len(STUDENT_ARGUMENTS)]).run()
+        turn_ms.append((time.perf_counter() - start) * 1000)
+        reruns.append(_script_runs(at) - before)
+        errors += len(at.exception)
+
+    start = time.perf_counter()
+    at.run()
+    render_ms = (time.perf_counter() - start) * 1000
+    return at, {"turn_ms": turn_ms, "reruns": reruns, "render_ms": render_ms, "errors": errors}
+
+
+def simulate_student(app_path, base_url, turns):
+    """Worker process: one warm-up session, then one measured session of `turns` messages."""
+    _count_script_runs()
+    _session(app_path, base_url, 1)
+
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    started = time.time()
+    at, result = _session(app_path, base_url, turns)
+    result["finished"] = time.time()
+    result["started"] = started
+    # `at` is still referenced here, so its session state counts towards the total.
+    result["memory"] = tracemalloc.get_traced_memory()[0] - memory_before
+    tracemalloc.stop()
+    return result
+
+
+def run_app(app, base_url, students, turns):
+    app_path = app if os.path.isabs(app) else os.path.join(APP_DIR, app)
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=students, mp_context=context) as pool:
+        futures = [pool.submit(simulate_student, app_path, base_url, turns) for _ in range(students)]
+        sessions = [f.result() for f in futures]
+    elapsed = max(s["finished"] for s in sessions) - min(s["started"] for s in sessions)
+
+    turn_ms = [t for s in sessions for t in s["turn_ms"]]
+    reruns = [r for s in sessions for r in s["reruns"]]
+    render_ms = [s["render_ms"] for s in sessions]
+    return {
+        "students": students,
+        "turns": len(turn_ms),
+        "errors": sum(s["errors"] for s in sessions),
+        "turn_p50_ms": round(_percentile(turn_ms, 50), 1),
+        "turn_p95_ms": round(_percentile(turn_ms, 95), 1),
+        "turn_p99_ms": round(_percentile(turn_ms, 99), 1),
+        "render_p50_ms": round(_percentile(render_ms, 50), 1),
+        "render_p95_ms": round(_percentile(render_ms, 95), 1),
+        "reruns_per_turn": round(statistics.fmean(reruns), 2) if reruns else 0.0,
+        "memory_per_session_kb": round(statistics.fmean(s["memory"] for s in sessions) / 1024, 1),
+        "throughput_turns_per_s": round(len(turn_ms) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions against `baseline`."""
+    regressions = []
+    for app, metrics in results.items():
+        old = baseline.get("apps", {}).get(app)
+        if old is None:
+            continue
+        for name in TRACKED_METRICS:
+            if name not in old:
+                continue
+            if metrics[name] > old[name] * (1 + tolerance):
+                regressions.append(f"{app}: {name} {metrics[name]} > baseline {old[name]} (+{tolerance:.0%} allowed)")
+    return regressions
+
+
+def _print_table(results):
+    columns = ("turn_p50_ms", "turn_p95_ms", "turn_p99_ms", "render_p95_ms", "reruns_per_turn",
+               "memory_per_session_kb", "throughput_turns_per_s", "errors")
+    width = max(len(app) for app in results) + 2
+    print("app".ljust(width) + "".join(c.rjust(24) for c in columns))
+    for app, metrics in results.items():
+        print(app.ljust(width) + "".join(str(metrics[c]).rjust(24) for c in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Reverse Tutor apps headlessly.")
+    parser.add_argument("apps", nargs="+", help="app scripts, relative to the repository root")
+    parser.add_argument("--students", type=int, default=4, help="concurrent simulated students per app")
+    parser.add_argument("--turns", type=int, default=len(STUDENT_ARGUMENTS), help="chat messages per student")
+    parser.add_argument("--base-url", help="use this OpenAI-compatible endpoint instead of the in-process mock")
+    parser.add_argument("--latency", type=float, default=0.3, help="mock: mean seconds to first token")
+    parser.add_argument("--latency-jitter", type=float, default=0.1)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock: share of 5xx responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="mock: share of 429 responses")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="compare against a saved baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown for --compare")
+    args = parser.parse_args(argv)
+
+    base_url = args.base_url
+    if base_url is None:
+        server = mock_server.start(mock_server.MockConfig(
+            latency=args.latency, latency_jitter=args.latency_jitter, tokens_per_second=args.tokens_per_second,
+            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+            concede_after=len(STUDENT_ARGUMENTS), seed=args.seed,
+        ))
+        base_url = server.base_url
+
+    results = {app: run_app(app, base_url, args.students, args.turns) for app in args.apps}
+    _print_table(results)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump({"config": vars(args), "apps": results}, f, indent=2)
+        print(f"Baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            return 1
+        print("No regressions against", args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,710 @@
+"""One bot class for every persona.
+
+The six apps used to carry their own copy of the bot class, each with its own
+`get_response`, history handling and opening code. A persona is now a
+declarative `Persona` (prompt, opening trigger, grade categories, hint policy,
+concession rule) and `PersonaBot` runs any of them on the shared completion
+engine, history compactor, model router and token accounting. The persona
+definitions live in `reverse_tutor.personas`; an app only builds the UI around
+`PersonaBot(get_persona(key), model)`.
+
+Each bot keeps its session as one `reverse_tutor.transcript.Transcript`; the
+chat panel and the API payload are both views of it. Given a
+`reverse_tutor.store.SessionStore`, a bot appends every sent turn to it,
+snapshots its state after each turn, and keeps in memory only the turns the
+compactor has not yet folded into the summary plus the most recent ones.
+
+For personas with hints, each reply also starts the next hint in the
+background while the student reads and types. It is tied to the transcript
+position it was generated for (`next_seq`): the hint button serves it without a
+round trip, and a message sent first throws it away. No hint is prefetched
+while the engine is busy (requests queued or held back by the rate limit), so
+speculative work never takes a slot from a student's reply. Set
+`HINT_PREFETCH = false` in `.streamlit/secrets.toml` to generate hints only on
+request.
+"""
+import logging
+import re
+from functools import partial
+
+from reverse_tutor import metrics
+from reverse_tutor.clients import setting
+from reverse_tutor.engine import get_completion_engine
+from reverse_tutor.grading import (
+    defer_grade_block,
+    get_grading_queue,
+    grading_params,
+    parse_scores,
+    structured_grading_enabled,
+)
+from reverse_tutor.history import HistoryCompactor
+from reverse_tutor.openings import generate_opening, get_opening_pool
+from reverse_tutor.prompts import system_messages
+from reverse_tutor.routing import KeywordEscalation, ModelRouter
+from reverse_tutor.tokens import TokenUsage
+from reverse_tutor.transcript import Transcript, make_turn
+
+logger = logging.getLogger(__name__)
+
+GRADE_MARKER = "---GRADE---"
+GRADE_END = "---END GRADE---"
+DEFAULT_PARAMS = {"temperature": 0.7, "max_tokens": 400}
+HINT_PLACEHOLDER = "[Hint request #{number}]"
+HINT_PLACEHOLDER_PATTERN = re.compile(r"\[Hint request #(\d+)\]")   # a stored HINT_PLACEHOLDER
+RECENT_MESSAGES = 40        # turns kept in memory even once summarised, so the chat panel still shows them
+
+_CONVICTION_TAG = re.compile(r"\[CONVICTION:(\d+)\]")
+_SCORE = re.compile(r"(\d+)\s*/\s*\d+")
+
+
+def parse_conviction(text):
+    """Strip [CONVICTION:XX] from response, return (clean_text, conviction_int_or_None)."""
+    match = _CONVICTION_TAG.search(text)
+    if match:
+        conviction = int(match.group(1))
+        clean = re.sub(r"\n?\[CONVICTION:\d+\]", "", text).strip()
+        return clean, conviction
+    return text, None
+
+
+def _strip_conviction(text):
+    return parse_conviction(text)[0]
+
+
+def strip_grade_block(text):
+    """The reply without its ---GRADE--- block, for apps that draw the scores elsewhere."""
+    return text.split(GRADE_MARKER)[0].strip() if GRADE_MARKER in text else text
+
+
+def parse_grade(response_text, categories):
+    """Numeric scores for `categories` (plus Total and Feedback) from a ---GRADE--- block, or None."""
+    if GRADE_MARKER not in response_text:
+        return None
+    try:
+        block = response_text.split(GRADE_MARKER)[1].split(GRADE_END)[0].strip()
+        scores = {}
+        for line in block.split("\n"):
+            line = line.strip()
+            for cat in (*categories, "Total"):
+                match = _SCORE.search(line)
+                if line.startswith(f"{cat}:") and match:
+                    scores[cat] = int(match.group(1))
+            if line.startswith("Feedback:"):
+                scores["Feedback"] = line.split(":", 1)[1].strip()
+        return scores or None
+    except Exception:
+        return None
+
+
+class ConvictionStreamFilter:
+    """Pass streamed text through while holding back [CONVICTION:XX] tags and the grade block."""
+    MARKERS = ("[CONVICTION:", GRADE_MARKER)
+
+    def __init__(self):
+        self.raw = ""
+        self._pos = 0          # index into `raw` up to which text has been handled
+        self._in_grade = False
+
+    def feed(self, chunk):
+        self.raw += chunk
+        return self._drain(final=False)
+
+    def flush(self):
+        return self._drain(final=True)
+
+    def _held_back(self, pending):
+        # Length of the longest suffix of `pending` that could still grow into a marker.
+        longest = 0
+        for marker in self.MARKERS:
+            for k in range(min(len(marker) - 1, len(pending)), longest, -1):
+                if pending.endswith(marker[:k]):
+                    longest = k
+                    break
+        return longest
+
+    def _drain(self, final):
+        out = []
+        while not self._in_grade:
+            pending = self.raw[self._pos:]
+            hits = [(pending.find(m), m) for m in self.MARKERS if m in pending]
+            if not hits:
+                hold = 0 if final else self._held_back(pending)
+                out.append(pending[:len(pending) - hold])
+                self._pos += len(pending) - hold
+                break
+            idx, marker = min(hits)
+            out.append(pending[:idx])
+            if marker == GRADE_MARKER:
+                # Everything from the grade block on is rendered from the parsed scores.
+                self._in_grade = True
+                break
+            close = pending.find("]", idx)
+            if close == -1:
+                self._pos += idx  # wait for the rest of the tag
+                break
+            self._pos += close + 1
+        return "".join(out)
+
+
+# ---- declarative pieces ----
+
+class HintPolicy:
+    """How many hints a student gets and the instruction sent for each one ({number} is the hint number)."""
+
+    def __init__(self, prompt, max_hints=3):
+        self.prompt = prompt
+        self.max_hints = max_hints
+
+    def request(self, number):
+        return self.prompt.format(number=number)
+
+
+def hint_prefetch_enabled():
+    return setting("HINT_PREFETCH", True)
+
+
+def concede_on_grade_block(response):
+    return GRADE_MARKER in response
+
+
+class KeywordConcession:
+    """Treat a reply as a concession when it contains any of `phrases` (case-insensitive)."""
+
+    def __init__(self, phrases):
+        self.phrases = [p.lower() for p in phrases]
+
+    def __call__(self, response):
+        text = response.lower()
+        return any(phrase in text for phrase in self.phrases)
+
+
+def escalate_on_keywords(groups, min_groups):
+    """Router rule factory: escalate once the student has covered `min_groups` keyword groups.
+
+    `groups` may be a callable taking the bot's context (e.g. a scenario key).
+    """
+    def build(bot):
+        return KeywordEscalation(groups(bot.context) if callable(groups) else groups, min_groups)
+    return build
+
+
+def escalate_on_conviction(threshold):
+    """Router rule factory: escalate once the bot's conviction is at or below `threshold`."""
+    def build(bot):
+        return lambda user_message: bot.conviction is not None and bot.conviction <= threshold
+    return build
+
+
+def default_pinned_state(bot):
+    lines = []
+    if bot.persona.hints is not None:
+        lines.append(f"Hints used so far: {bot.hints_used} of {bot.max_hints}.")
+    lines.append("You have already conceded and graded the student." if bot.conceded else "You have not conceded yet.")
+    return lines
+
+
+class Persona:
+    """Everything that differs between bots, as data.
+
+    `prompt` is a string or `PromptLayout`, or a callable building one from the
+    bot's context (such as a scenario key). `params` are the completion
+    parameters for chat turns; `opening_params` those for the opening statement.
+    `display` maps a reply to what the chat panel shows; by default only the
+    conviction tag is removed.
+    """
+
+    def __init__(self, key, name, prompt, opening_trigger, concession=concede_on_grade_block,
+                 grade_categories=None, hints=None, conviction=None, params=DEFAULT_PARAMS,
+                 opening_params=None, summary_focus="", escalation=None, pinned_state=default_pinned_state,
+                 display=None):
+        self.key = key
+        self.name = name
+        self.prompt = prompt
+        self.opening_trigger = opening_trigger
+        self.concession = concession
+        self.grade_categories = grade_categories
+        self.hints = hints
+        self.conviction = conviction        # starting conviction for personas that emit [CONVICTION:XX]
+        self.params = dict(params)
+        self.opening_params = dict(opening_params or {})
+        self.summary_focus = summary_focus
+        self.escalation = escalation
+        self.pinned_state = pinned_state
+        self.display = display
+
+    def system_prompt(self, context=None):
+        return self.prompt(context) if callable(self.prompt) else self.prompt
+
+    def session_prompt(self, context=None):
+        """The system prompt a bot sends, with the grade block deferred under structured grading."""
+        prompt = self.system_prompt(context)
+        if self.grade_categories and structured_grading_enabled():
+            prompt = defer_grade_block(prompt)
+        return prompt
+
+    # ---- opening statements ----
+
+    def opening_key(self, context, model):
+        return (self.key, context, model)
+
+    def opening_generator(self, context, model):
+        return partial(generate_opening, get_completion_engine(), model, self.session_prompt(context),
+                       self.opening_trigger, persona=self.key, **self.opening_params)
+
+    def warm_openings(self, model, contexts=(None,)):
+        """Start filling the opening pool for each of `contexts` without building a bot."""
+        pool = get_opening_pool()
+        for context in contexts:
+            pool.refill(self.opening_key(context, model), self.opening_generator(context, model))
+
+    @property
+    def clean(self):
+        """Maps a reply to its chat panel text, or None to show it as is."""
+        if self.display is None and self.conviction is not None:
+            return _strip_conviction
+        return self.display
+
+    def turns(self, rows):
+        """Yield a `Turn` per stored row (seq, role, content), oldest first.
+
+        The opening trigger and hint requests are hidden and hint replies flagged.
+        """
+        clean, hint = self.clean, None
+        for row in rows:
+            flags = {}
+            if row["role"] == "user":
+                match = HINT_PLACEHOLDER_PATTERN.fullmatch(row["content"])
+                if match:
+                    hint = int(match.group(1))
+                    flags["shown"] = False
+                elif row["seq"] == 0:
+                    flags["shown"] = False
+            elif hint is not None:
+                flags["hint"] = hint
+                hint = None
+            yield make_turn(row["role"], row["content"], clean, seq=row["seq"], **flags)
+
+    def transcript(self, model, rows=()):
+        """A transcript holding the stored `rows`."""
+        return Transcript(model, self.turns(rows), clean=self.clean)
+
+    def display_messages(self, rows):
+        """The shown messages of stored `rows` in the apps' export format, without tokenising them."""
+        return [turn.as_dict() for turn in self.turns(rows) if turn.shown]
+
+
+# ---- the bot ----
+
+class PersonaBot:
+    def __init__(self, persona, model_name, context=None, store=None, session_id=None):
+        self.persona = persona
+        self.context = context
+        self.engine = get_completion_engine()
+        self.model = model_name
+        self.conceded = False
+        self.hints_used = 0
+        self.conviction = persona.conviction
+        self.usage = TokenUsage()
+        self.last_raw_response = None
+        self.compactor = HistoryCompactor(self.engine, summary_focus=persona.summary_focus, persona=persona.key)
+        self.router = ModelRouter(
+            model_name, escalate=persona.escalation(self) if persona.escalation else None
+        )
+        self.system_prompt = persona.session_prompt(context)
+        self.grade_response = None      # the reply that conceded, for the score panel
+        self.scores = None              # numeric scores from the structured grading job
+        self._grading_failed = False
+        self._hint_prefetch = None      # (next_seq it was generated for, Ticket)
+        self.next_seq = 0               # store position of the next sent turn
+        self.history_offset = 0         # store position of the first turn held in memory
+        self.released_messages = 0      # shown messages dropped from memory (still in the store)
+        self.released_user_turns = 0    # ... of which the student's
+        self.store = store
+        self.session_id = session_id
+        self._transcript = persona.transcript(model_name)
+        if store is not None and session_id is None:
+            self.session_id = store.create(persona.key, model_name, context)
+
+    @classmethod
+    def resume(cls, persona, store, session_id, context=None):
+        """Rebuild a stored session on the model it was stored with.
+
+        None if the session does not exist or belongs to another persona or context.
+        """
+        session = store.session(session_id)
+        if session is None or session["persona"] != persona.key or session["context"] != context:
+            return None
+        bot = cls(persona, session["model"], context, store=store, session_id=session_id)
+        state = session["state"]
+        bot.conceded = state.get("conceded", False)
+        bot.hints_used = state.get("hints_used", 0)
+        bot.conviction = state.get("conviction", bot.conviction)
+        bot.grade_response = state.get("grade_response")
+        bot.scores = state.get("scores")
+        bot.next_seq = state.get("next_seq", 0)
+        bot.history_offset = state.get("history_offset", 0)
+        if bot.history_offset:
+            released = persona.display_messages(store.turns(session_id, 0, bot.history_offset))
+            bot.released_messages = len(released)
+            bot.released_user_turns = sum(1 for m in released if m["role"] == "user")
+        bot.compactor.summary = state.get("summary", "")
+        bot.usage.restore(state.get("usage", {}))
+        bot._load(state.get("folded_seq", 0))
+        store.touch(bot)
+        return bot
+
+    @property
+    def max_hints(self):
+        return self.persona.hints.max_hints if self.persona.hints else 0
+
+    @property
+    def transcript(self):
+        """The session's turns; read back from the store if the bot was evicted while idle."""
+        if self._transcript is None:
+            self._load(self.store.session(self.session_id)["state"].get("folded_seq", 0))
+        return self._transcript
+
+    def message_count(self):
+        """Shown messages in the whole session, including those no longer held in memory."""
+        return self.released_messages + len(self.transcript.display())
+
+    def user_turns(self):
+        """The student's messages in the whole session."""
+        return self.released_user_turns + self.transcript.user_turns()
+
+    def session_messages(self):
+        """Every shown message of the session in the apps' export format.
+
+        Turns released from memory are read back from the store, so exports
+        cover the whole debate, not just the recent part the chat panel holds.
+        """
+        messages = self.transcript.display_messages()
+        if self.store is None or not self.history_offset:
+            return messages
+        rows = self.store.turns(self.session_id, 0, self.history_offset)
+        return self.persona.display_messages(rows) + messages
+
+    def show_error(self, text):
+        """Put an error on the chat panel without making it part of the history."""
+        self.transcript.add("assistant", text, sent=False)
+
+    # ---- opening statement ----
+
+    def open_conversation(self):
+        """Take an opening from the warm pool and record it as the first exchange; returns the raw text."""
+        opening = get_opening_pool().take(self.persona.opening_key(self.context, self.model),
+                                          self.persona.opening_generator(self.context, self.model))
+        self._remember("user", self.persona.opening_trigger, shown=False)
+        self._remember("assistant", opening)
+        if self.conviction is not None:
+            _, conviction = parse_conviction(opening)
+            if conviction is not None:
+                self.conviction = conviction
+        self._checkpoint()
+        self.prefetch_hint()
+        return opening
+
+    # ---- persistence ----
+
+    def _remember(self, role, content, **flags):
+        # Stored first, so a failed write never leaves a turn in the transcript that the store lacks.
+        if self.store is not None:
+            self.store.append(self.session_id, self.next_seq, role, content)
+        self.transcript.add(role, content, seq=self.next_seq, **flags)
+        self.next_seq += 1
+
+    def _seq_at(self, index):
+        """Store position of the first sent turn at or after `index` in the transcript."""
+        for turn in self._transcript[index:]:
+            if turn.sent:
+                return turn.seq
+        return self.next_seq
+
+    @property
+    def _folded_seq(self):
+        return self._seq_at(self.compactor.folded)
+
+    def _state(self):
+        return {
+            "conceded": self.conceded,
+            "hints_used": self.hints_used,
+            "conviction": self.conviction,
+            "grade_response": self.grade_response,
+            "scores": self.scores,
+            "next_seq": self.next_seq,
+            "history_offset": self.history_offset,
+            "folded_seq": self._folded_seq,
+            "summary": self.compactor.summary,
+            "usage": self.usage.snapshot(),
+        }
+
+    def _checkpoint(self):
+        """Drop turns that are summarised and off screen and, if persisted, save the bot's state."""
+        if self.store is None:
+            return
+        shown, user_turns = len(self._transcript.display()), self._transcript.user_turns()
+        if self.compactor.release(self._transcript, keep=RECENT_MESSAGES):
+            self.released_messages += shown - len(self._transcript.display())
+            self.released_user_turns += user_turns - self._transcript.user_turns()
+        self.history_offset = self._seq_at(0)
+        self.store.save_state(self.session_id, self._state(), self.model)
+        self.store.touch(self)
+
+    def unload(self):
+        """Free the transcript of an idle bot; the `transcript` property reads it back from the store."""
+        self._transcript = None
+
+    def _load(self, folded_seq):
+        """Rebuild the transcript from the store."""
+        rows = self.store.turns(self.session_id, self.history_offset)
+        self._transcript = self.persona.transcript(self.model, rows)
+        folded = sum(1 for row in rows if row["seq"] < folded_seq)
+        self.compactor.reset(folded)
+
+    # ---- turns ----
+
+    def _build_messages(self, user_message, is_hint_request):
+        transcript = self.transcript
+        if self.store is not None:
+            self.store.touch(self)
+        messages = self.compactor.build_messages(
+            self.system_prompt, transcript, self.persona.pinned_state(self)
+        )
+        if is_hint_request:
+            messages.append({"role": "user", "content": self.persona.hints.request(self.hints_used + 1)})
+        else:
+            messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def _completion_params(self, user_message, is_hint_request, messages):
+        return dict(
+            self.persona.params,
+            model=self.router.pick(user_message, is_hint_request, self.conceded),
+            messages=messages,
+            persona=self.persona.key,
+        )
+
+    def _record_turn(self, user_message, is_hint_request, ai_response):
+        if is_hint_request:
+            self.hints_used += 1
+            self._remember("user", HINT_PLACEHOLDER.format(number=self.hints_used), shown=False)
+            self._remember("assistant", ai_response, hint=self.hints_used)
+        else:
+            self._remember("user", user_message)
+            self._remember("assistant", ai_response)
+
+        with metrics.timer("parse", self.persona.key, self.model):
+            if self.conviction is not None:
+                _, conviction = parse_conviction(ai_response)
+                if conviction is not None:
+                    self.conviction = conviction
+
+            if not self.conceded and self.persona.concession(ai_response):
+                self.conceded = True
+                self.grade_response = ai_response
+        self._checkpoint()
+
+    def _record_failure(self, user_message, is_hint_request, error):
+        # Shown so the student sees what happened, but never sent to the API.
+        if is_hint_request:
+            self.transcript.add("assistant", error, sent=False, hint=self.hints_used)
+        else:
+            self.transcript.add("user", user_message, sent=False)
+            self.transcript.add("assistant", error, sent=False)
+
+    # ---- hint prefetch ----
+
+    def prefetch_hint(self):
+        """Start generating the next hint for the transcript as it is now, if the student has one left."""
+        if (self.persona.hints is None or self.conceded or self.hints_used >= self.max_hints
+                or not hint_prefetch_enabled()):
+            return
+        if self._hint_prefetch is not None and self._hint_prefetch[0] == self.next_seq:
+            return
+        self.discard_hint_prefetch()
+        if self.engine.busy():
+            return      # the hint button will request it live
+        messages = self._build_messages("", is_hint_request=True)
+        ticket = self.engine.submit(**self._completion_params("", True, messages))
+        self._hint_prefetch = (self.next_seq, ticket)
+
+    def discard_hint_prefetch(self):
+        if self._hint_prefetch is None:
+            return
+        _, ticket = self._hint_prefetch
+        self._hint_prefetch = None
+        if not ticket.cancel() and ticket.done():
+            try:
+                self.usage.record(ticket.result().usage)   # finished, so it was paid for
+            except Exception:
+                pass
+
+    def _take_prefetched_hint(self, is_hint_request, on_wait=None):
+        """The prefetched hint's completion for this turn, or None to request it live.
+
+        A prefetch is only used by a hint request on the transcript it was
+        generated for; any other turn discards it. If it is still running this
+        waits for it, which is never longer than a fresh request would take.
+        """
+        if not is_hint_request or self._hint_prefetch is None or self._hint_prefetch[0] != self.next_seq:
+            self.discard_hint_prefetch()
+            return None
+        _, ticket = self._hint_prefetch
+        self._hint_prefetch = None
+        try:
+            return self.engine.wait(ticket, on_wait)
+        except Exception:
+            logger.warning("Prefetched hint failed; requesting it again", exc_info=True)
+            return None
+
+    # ---- grading ----
+
+    @property
+    def _grading_key(self):
+        return self.session_id or id(self)
+
+    def _full_history(self):
+        """Every sent turn of the session, including those the compactor has summarised."""
+        if self.store is None:
+            return self.transcript.api_messages()
+        return [{"role": row["role"], "content": row["content"]} for row in self.store.turns(self.session_id)]
+
+    def _start_grading(self, pending_message=None):
+        """Queue the grading job for this session; `pending_message` is a student turn not yet recorded."""
+        if self.scores is not None or not self.persona.grade_categories or not structured_grading_enabled():
+            return
+        messages = system_messages(self.system_prompt) + self._full_history()
+        if pending_message is not None:
+            messages.append({"role": "user", "content": pending_message})
+        params = grading_params(self.persona.grade_categories, self.model, messages)
+        get_grading_queue().submit(self._grading_key, self.engine, dict(params, persona=self.persona.key))
+
+    def _collect_grading(self):
+        queue = get_grading_queue()
+        try:
+            completion = queue.take(self._grading_key)
+            if completion is None:
+                if not queue.has_job(self._grading_key) and not self._grading_failed:
+                    self._start_grading()   # e.g. a resumed session whose job was never collected
+                return
+            self.usage.record(completion.usage)
+            self.scores = parse_scores(completion.choices[0].message.content, self.persona.grade_categories)
+        except Exception:
+            logger.warning("Structured grading failed; using the reply's grade block", exc_info=True)
+            self._grading_failed = True
+            return
+        self._checkpoint()
+
+    @property
+    def grading_pending(self):
+        """True while this session's grading job is still running."""
+        return get_grading_queue().pending(self._grading_key)
+
+    def get_response(self, user_message, is_hint_request=False, on_wait=None):
+        with metrics.timer("turn", self.persona.key, self.model):
+            return self._get_response(user_message, is_hint_request, on_wait)
+
+    def _get_response(self, user_message, is_hint_request, on_wait):
+        completion = self._take_prefetched_hint(is_hint_request, on_wait)
+        messages = self._build_messages(user_message, is_hint_request) if completion is None else None
+        try:
+            if completion is None:
+                completion = self.engine.complete(
+                    on_wait=on_wait, **self._completion_params(user_message, is_hint_request, messages)
+                )
+            ai_response = completion.choices[0].message.content.strip()
+            self.usage.record(completion.usage)
+            was_conceded = self.conceded
+            self._record_turn(user_message, is_hint_request, ai_response)
+            if self.conceded and not was_conceded:
+                self._start_grading()
+            self.prefetch_hint()
+            return ai_response
+
+        except Exception as e:
+            error = f"❌ API Error: {str(e)}"
+            self._record_failure(user_message, is_hint_request, error)
+            return error
+
+    def stream_response(self, user_message, is_hint_request=False, on_wait=None):
+        """Yield the visible reply as it streams in.
+
+        The conviction tag and the grade block are held back from the yielded
+        text; the full raw reply is left in `self.last_raw_response` once the
+        generator is exhausted. Grading starts as soon as the streamed text
+        concedes, while the rest of the reply is still arriving. A prefetched
+        hint is yielded in one piece.
+        """
+        with metrics.timer("turn", self.persona.key, self.model):
+            yield from self._stream_response(user_message, is_hint_request, on_wait)
+
+    def _stream_response(self, user_message, is_hint_request, on_wait):
+        prefetched = self._take_prefetched_hint(is_hint_request, on_wait)
+        messages = self._build_messages(user_message, is_hint_request) if prefetched is None else None
+        tag_filter = ConvictionStreamFilter()
+        self.last_raw_response = None
+        grading_started = self.conceded
+        try:
+            if prefetched is not None:
+                self.usage.record(prefetched.usage)
+                pieces = [prefetched.choices[0].message.content]
+            else:
+                pieces = self._stream_text(user_message, is_hint_request, messages, on_wait)
+            for piece in pieces:
+                visible = tag_filter.feed(piece)
+                if (not grading_started and self.persona.grade_categories
+                        and self.persona.concession(tag_filter.raw)):
+                    self._start_grading(None if is_hint_request else user_message)
+                    grading_started = True
+                if visible:
+                    yield visible
+            tail = tag_filter.flush()
+            if tail:
+                yield tail
+
+        except Exception as e:
+            self.last_raw_response = f"❌ API Error: {str(e)}"
+            self._record_failure(user_message, is_hint_request, self.last_raw_response)
+            yield self.last_raw_response
+            return
+
+        ai_response = tag_filter.raw.strip()
+        self._record_turn(user_message, is_hint_request, ai_response)
+        if self.conceded and not grading_started:
+            self._start_grading()
+        self.last_raw_response = ai_response
+        self.prefetch_hint()
+
+    def _stream_text(self, user_message, is_hint_request, messages, on_wait):
+        stream = self.engine.stream(
+            on_wait=on_wait,
+            stream_options={"include_usage": True},
+            **self._completion_params(user_message, is_hint_request, messages),
+        )
+        for chunk in stream:
+            if chunk.usage:
+                self.usage.record(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def next_payload_tokens(self):
+        return self.compactor.payload_tokens(self.system_prompt, self.transcript, self.model)
+
+    def parse_grade(self, response_text):
+        if not self.persona.grade_categories:
+            return None
+        with metrics.timer("parse", self.persona.key, self.model):
+            return parse_grade(response_text, self.persona.grade_categories)
+
+    def grade(self):
+        """Numeric scores once the bot has conceded and they are ready, else None.
+
+        Never waits: while the grading job runs (`grading_pending`) this is
+        None. Without structured grading, or if the job failed, the scores
+        come from the conceding reply's grade block, if it has one.
+        """
+        if self.scores is None and self.conceded:
+            self._collect_grading()
+        if self.scores is None and self.grade_response:
+            return self.parse_grade(self.grade_response)
+        return self.scores
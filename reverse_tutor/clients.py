@@ -0,0 +1,53 @@
+"""Connection settings shared by every bot session.
+
+Each Streamlit session used to build its own `OpenAI(...)`, so every Reset,
+model switch and new login opened a fresh connection pool. All requests now go
+through the process-wide `reverse_tutor.engine.CompletionEngine`, whose single
+keep-alive pool takes its bounds from here. `setting` reads any other value
+from secrets with a typed default.
+
+Pool limits can be tuned from `.streamlit/secrets.toml`:
+
+    OPENAI_MAX_CONNECTIONS = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = 20
+    OPENAI_KEEPALIVE_EXPIRY = 30
+
+Set OPENAI_BASE_URL to send every request to another OpenAI-compatible
+endpoint instead, such as the local stand-in in `reverse_tutor.mock_server`.
+Without it the SDK default applies (including its own OPENAI_BASE_URL
+environment variable).
+"""
+import httpx
+import streamlit as st
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_KEEPALIVE_EXPIRY = 30.0  # seconds an idle socket is kept open
+
+
+def setting(name, default):
+    """The secret `name`, converted to the type of `default`, or `default` if it is not set.
+
+    For a boolean, the strings "false", "no", "off" and "0" are false.
+    """
+    value = st.secrets.get(name, default)
+    if isinstance(default, bool) and isinstance(value, str):
+        return value.strip().lower() not in ("false", "no", "off", "0", "")
+    return type(default)(value)
+
+
+def base_url():
+    """Endpoint override from secrets, or None for the SDK default."""
+    return st.secrets.get("OPENAI_BASE_URL") or None
+
+
+def pool_limits():
+    """Connection limits for the shared pool, read from secrets with defaults."""
+    return httpx.Limits(
+        max_connections=setting("OPENAI_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS),
+        max_keepalive_connections=setting(
+            "OPENAI_MAX_KEEPALIVE_CONNECTIONS", DEFAULT_MAX_KEEPALIVE_CONNECTIONS
+        ),
+        keepalive_expiry=setting("OPENAI_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY),
+    )
+
@@ -0,0 +1,325 @@
+"""Local concession detection.
+
+Nick, Dan and Denethor used to decide that the bot had conceded when its reply
+contained any of a handful of phrases. Phrases like "correct", "good point"
+and "I understand" turn up in almost every in-character reply ("Good point,
+but..."), so those bots conceded on the first polite answer. Asking the model
+would be accurate but costs a round-trip per turn.
+
+`ConcessionClassifier` scores a reply locally instead. One compiled pattern
+per persona finds, in a single pass:
+
+- the persona's own concession line, taken from its system prompt
+  (`concession_line`), clause by clause;
+- strong cues that only a concession uses ("I concede", "I was wrong",
+  "blinded me", "I see now");
+- weak cues that polite disagreement uses too ("good point", "correct");
+- contrast words after a cue ("..., but"), and negations just before one
+  ("I'm not convinced", "I won't concede").
+
+It also measures how much of the concession line's vocabulary the reply
+echoes (`echo`), which catches paraphrases of the line ("Perhaps my reliance
+on the old ways blinded me") that match none of its clauses word for word.
+
+The counts go through a small logistic model (WEIGHTS) and the reply counts as
+a concession when the probability is at least `threshold`. A typical reply takes a
+few tens of microseconds to score.
+
+WEIGHTS are fitted to `labels/concession.jsonl`: 104 hand-labelled Nick, Dan
+and Denethor replies (42 concessions), written to cover the personas' lines,
+paraphrases of them, and the polite disagreement the old keyword rule took
+for a concession. Measure the classifier (and that keyword rule) and refit it with:
+
+    python -m reverse_tutor.concession label export.json --persona nick > more.jsonl
+    python -m reverse_tutor.concession eval [labels.jsonl]
+    python -m reverse_tutor.concession fit [labels.jsonl]
+
+`label` turns the apps' JSON exports into one line per bot reply with
+`concession` left empty, to be filled in by hand; the apps decide
+`bot_conceded` with this classifier, so neither it nor the classifier's own
+guess is a label. `eval` prints precision and recall per persona, `fit`
+prints refitted WEIGHTS with their cross-validated scores. Both default to
+the bundled labels.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+from reverse_tutor.bots import GRADE_MARKER, KeywordConcession
+
+STRONG_CUES = [
+    "i concede", "i'll concede", "i must concede", "i have to concede", "you've convinced me",
+    "you have convinced me", "i was wrong", "i was mistaken", "i stand corrected", "i've changed my mind",
+    "i have changed my mind", "you've changed my mind", "you win", "i yield", "i admit defeat",
+    "my misconception", "i was oversimplifying", "admit defeat", "blinded me", "i see now", "i see it now",
+    "you've shown me", "you have shown me", "i had not considered", "i did not consider", "you've got me",
+    "i'm persuaded", "i am persuaded", "point taken", "that settles it",
+]
+WEAK_CUES = [
+    "you're right", "you are right", "you're correct", "you are correct", "correct", "good point",
+    "fair point", "fair enough", "i see your point", "i understand", "i agree", "that makes sense",
+    "i admit", "i have to admit", "i must admit", "i accept", "i grant you", "i yield", "so be it",
+    "convincing", "i hadn't considered",
+]
+CONTRAST = ["but", "however", "still", "yet", "although", "though"]
+NEGATION = re.compile(r"\b(?:not|never|won't|can't|cannot|don't|isn't|aren't|haven't|hardly)\b[\w\s']{0,12}$")
+RUBRIC = re.compile(r"overall score|final evaluation|\(1[–-]5 pts\)")
+
+# The legacy keyword rule the classifier replaced, kept as the baseline for `eval`.
+KEYWORD_BASELINE = ["concede", "you're right", "i was wrong", "i understand", "correct", "good point"]
+
+LABELS_PATH = Path(__file__).resolve().parent / "labels" / "concession.jsonl"
+
+# Logistic weights over the features from ConcessionClassifier.features(), from `fit` on LABELS_PATH.
+WEIGHTS = {
+    "bias": -2.69,
+    "line": 0.9,        # fraction of the persona's concession line found in the reply
+    "echo": 1.03,       # fraction of the concession line's words the reply uses
+    "strong": 4.9,      # distinct strong cues, at most 2
+    "weak": 1.67,       # distinct weak cues, at most 3
+    "negated": 0.0,     # cues with a negation just before them
+    "contrast": -2.07,  # a contrast word after the first cue
+    "rubric": 3.18,     # the reply starts grading
+}
+
+_LINE = re.compile(
+    r"when (?:conceding|you concede)\b[^\n]*\n?\s*[\"“]([^\"”]+)[\"”]", re.IGNORECASE
+)
+_CLAUSE_SPLIT = re.compile(r"[.!?;,:—–]+")
+_WORD = re.compile(r"[a-z][a-z'-]+")
+# Words too common in any reply to say the line is being echoed.
+_COMMON = frozenset(
+    "the and that this these those then than what with from have has had been were are was "
+    "your you you're you've i'm i've our they them their there here which whether about into "
+    "only just much more less very also indeed truly".split()
+)
+_QUOTES = str.maketrans({"’": "'", "‘": "'", "“": '"', "”": '"'})
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(text):
+    return _SPACE.sub(" ", text.translate(_QUOTES).lower())
+
+
+def concession_line(prompt):
+    """The quoted line a system prompt tells the bot to concede with, or ""."""
+    match = _LINE.search(prompt)
+    return match.group(1).strip() if match else ""
+
+
+class ConcessionClassifier:
+    """Concession check for `Persona(concession=...)`: call it with a reply."""
+
+    def __init__(self, line="", threshold=0.5, weights=WEIGHTS):
+        self.line = line
+        self.threshold = threshold
+        self.weights = dict(weights)
+        # Clauses of three words or more; shorter ones ("I see") are too common to mean anything.
+        self.clauses = [c for c in (normalize(c).strip() for c in _CLAUSE_SPLIT.split(line)) if len(c.split()) >= 3]
+        self.line_words = {w for w in _WORD.findall(normalize(line)) if len(w) > 3 and w not in _COMMON}
+        self._kinds = {}
+        # A clause of the line that is also a general cue ("you've convinced me") counts as that cue.
+        for kind, phrases in (("line", self.clauses), ("contrast", CONTRAST), ("weak", WEAK_CUES),
+                              ("strong", STRONG_CUES)):
+            self._kinds.update(dict.fromkeys(phrases, kind))
+        # Longest first, so "you're correct" wins over "correct" at the same position.
+        self._pattern = re.compile(r"\b(?:" + "|".join(
+            re.escape(phrase) for phrase in sorted(self._kinds, key=len, reverse=True)
+        ) + r")\b")
+
+    @classmethod
+    def from_prompt(cls, prompt, **kwargs):
+        """A classifier for the persona whose system prompt is `prompt`."""
+        return cls(concession_line(prompt), **kwargs)
+
+    def features(self, response):
+        text = normalize(response)
+        found = {"line": set(), "strong": set(), "weak": set()}
+        negated = 0
+        first_cue = None
+        contrast = 0
+        for match in self._pattern.finditer(text):
+            phrase = match.group()
+            kind = self._kinds[phrase]
+            if kind == "contrast":
+                contrast = contrast or int(first_cue is not None and match.start() > first_cue)
+                continue
+            if kind != "line" and NEGATION.search(text, max(0, match.start() - 30), match.start()):
+                negated += 1
+                continue
+            found[kind].add(phrase)
+            if first_cue is None and kind != "line":
+                first_cue = match.start()
+        echoed = self.line_words.intersection(_WORD.findall(text)) if self.line_words else ()
+        return {
+            "line": len(found["line"]) / len(self.clauses) if self.clauses else 0.0,
+            "echo": len(echoed) / len(self.line_words) if self.line_words else 0.0,
+            "strong": min(len(found["strong"]), 2),
+            "weak": min(len(found["weak"]), 3),
+            "negated": negated,
+            "contrast": contrast,
+            "rubric": int(GRADE_MARKER.lower() in text or bool(RUBRIC.search(text))),
+        }
+
+    def probability(self, response):
+        features = self.features(response)
+        z = self.weights["bias"] + sum(self.weights[name] * value for name, value in features.items())
+        return 1.0 / (1.0 + math.exp(-z))
+
+    def __call__(self, response):
+        return self.probability(response) >= self.threshold
+
+
+# ---- labelling and evaluation ----
+
+def _persona_classifier(key):
+    from reverse_tutor.personas import get_persona   # the personas import this module
+
+    persona = get_persona(key)
+    if isinstance(persona.concession, ConcessionClassifier):
+        return persona.concession
+    return ConcessionClassifier.from_prompt(persona.system_prompt())
+
+
+def _read_labels(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def label(paths, persona):
+    """Yield one unlabelled record per bot reply in the apps' JSON exports."""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            export = json.load(f)
+        for message in export.get("conversation", []):
+            if message.get("role") == "assistant":
+                yield {"persona": persona, "source": str(path), "text": message["content"], "concession": None}
+
+
+def evaluate(records, detectors):
+    """Precision, recall, F1 and mean scoring time (µs) per detector name."""
+    results = {}
+    for name, detect in detectors.items():
+        tp = fp = fn = 0
+        start = time.perf_counter()
+        for record in records:
+            predicted = detect(record)
+            tp += predicted and record["concession"]
+            fp += predicted and not record["concession"]
+            fn += not predicted and record["concession"]
+        elapsed = time.perf_counter() - start
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        results[name] = {
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "us_per_reply": elapsed / max(len(records), 1) * 1e6,
+        }
+    return results
+
+
+def _samples(records):
+    classifiers = {}
+    samples = []
+    for record in records:
+        key = record["persona"]
+        if key not in classifiers:
+            classifiers[key] = _persona_classifier(key)
+        samples.append((classifiers[key].features(record["text"]), float(record["concession"])))
+    return samples
+
+
+def fit(records, epochs=5000, rate=0.5, l2=0.003):
+    """WEIGHTS refitted to `records` by logistic regression (plain gradient descent)."""
+    return _fit_samples(_samples(records), epochs, rate, l2)
+
+
+def _fit_samples(samples, epochs=5000, rate=0.5, l2=0.003):
+    weights = dict.fromkeys(WEIGHTS, 0.0)
+    names = [name for name in weights if name != "bias"]
+    for _ in range(epochs):
+        grad = dict.fromkeys(weights, 0.0)
+        for features, target in samples:
+            z = weights["bias"] + sum(weights[n] * features[n] for n in names)
+            error = 1.0 / (1.0 + math.exp(-z)) - target
+            grad["bias"] += error
+            for n in names:
+                grad[n] += error * features[n]
+        for n in weights:
+            penalty = l2 * weights[n] if n != "bias" else 0.0
+            weights[n] -= rate * (grad[n] / len(samples) + penalty)
+    return {n: round(w, 2) for n, w in weights.items()}
+
+
+def cross_validate(records, folds=5, seed=0, **fit_args):
+    """Precision, recall and F1 of weights fitted on the other folds, pooled over `folds` folds."""
+    samples = _samples(records)
+    order = list(range(len(samples)))
+    random.Random(seed).shuffle(order)
+    tp = fp = fn = 0
+    for k in range(folds):
+        held = set(order[k::folds])
+        weights = _fit_samples([s for i, s in enumerate(samples) if i not in held], **fit_args)
+        for i in held:
+            features, target = samples[i]
+            z = weights["bias"] + sum(weights[n] * features[n] for n in features)
+            predicted, actual = z >= 0, bool(target)
+            tp += predicted and actual
+            fp += predicted and not actual
+            fn += not predicted and actual
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Label, evaluate and fit the local concession classifier.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("label", help="turn JSON exports into label records (JSONL on stdout)")
+    p.add_argument("exports", nargs="+")
+    p.add_argument("--persona", required=True, help="persona key, e.g. nick")
+    p = sub.add_parser("eval", help="precision and recall against labelled replies")
+    p.add_argument("labels", nargs="?", default=str(LABELS_PATH))
+    p = sub.add_parser("fit", help="print WEIGHTS fitted to labelled replies")
+    p.add_argument("labels", nargs="?", default=str(LABELS_PATH))
+    args = parser.parse_args(argv)
+
+    if args.command == "label":
+        for record in label(args.exports, args.persona):
+            print(json.dumps(record, ensure_ascii=False))
+        return
+    records = _read_labels(args.labels)
+    unlabelled = sum(r["concession"] is None for r in records)
+    if unlabelled:
+        parser.error(f"{args.labels}: {unlabelled} replies have no label yet")
+    if args.command == "fit":
+        print(json.dumps(fit(records), indent=4))
+        m = cross_validate(records)
+        print(f"5-fold cross-validation: precision {m['precision']:.2f}  recall {m['recall']:.2f}  "
+              f"F1 {m['f1']:.2f}", file=sys.stderr)
+        return
+
+    keywords = KeywordConcession(KEYWORD_BASELINE)
+    for persona in sorted({r["persona"] for r in records}):
+        subset = [r for r in records if r["persona"] == persona]
+        classifier = _persona_classifier(persona)
+        results = evaluate(subset, {
+            "keywords": lambda r: keywords(r["text"]),
+            "classifier": lambda r: classifier(r["text"]),
+        })
+        positives = sum(r["concession"] for r in subset)
+        print(f"{persona}: {len(subset)} replies, {positives} concessions")
+        for name, m in results.items():
+            print(f"  {name:10}  precision {m['precision']:.2f}  recall {m['recall']:.2f}  "
+                  f"F1 {m['f1']:.2f}  {m['us_per_reply']:.1f} µs/reply")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""Shared asyncio completion engine.
+
+Every bot used to make a blocking `client.chat.completions.create` call on its
+own Streamlit script thread. The engine runs one event loop in a background
+thread with an `AsyncOpenAI` client, so all sessions in the process multiplex
+their requests over the same loop and connection pool. A semaphore bounds how
+many requests are in flight at once; anything beyond that waits on the loop
+instead of tying up another socket.
+
+The engine also owns retries. It reads the `x-ratelimit-*` headers on every
+response and stops admitting new requests once the remaining budget is spent,
+until the provider's reset time. 429s, 5xx responses and connection errors
+are retried with jittered exponential backoff. While a request waits, its
+`Ticket` reports its place in the queue so the UI can show it.
+
+Script threads submit work with `submit()` (returns a `Ticket`, whose result
+`wait()` collects), `complete()` (waits for the result) or `stream()` (yields
+chunks as they arrive). Each takes an optional `persona` key that labels the
+request's queue and API timings, tokens, retries and errors in
+`reverse_tutor.metrics`.
+"""
+import asyncio
+import concurrent.futures
+import email.utils
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import httpx
+import streamlit as st
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    RateLimitError,
+)
+
+from reverse_tutor import metrics
+from reverse_tutor.clients import setting, base_url, pool_limits
+
+DEFAULT_MAX_IN_FLIGHT = 64
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 1.0         # seconds; doubles each attempt before jitter
+BACKOFF_CAP = 30.0         # upper bound on a single backoff
+LOW_TOKEN_WATERMARK = 0.02  # hold admissions when under this share of the token budget remains
+POLL_INTERVAL = 0.25       # how often waiting callers refresh their queue notice
+
+_STREAM_END = object()
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_duration(value):
+    """Seconds in a rate-limit reset header such as "1s", "6m0s" or "250ms"."""
+    if not value:
+        return 0.0
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in _DURATION_PART.findall(value))
+
+
+def _retry_after(value):
+    """Seconds in a Retry-After header (delay-seconds or an HTTP-date); 0 if absent or unreadable."""
+    if not value:
+        return 0.0
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def _header_int(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def _estimate_request_tokens(params):
+    text = sum(len(str(m.get("content", ""))) for m in params.get("messages", ()))
+    return text // 4 + (params.get("max_tokens") or 0)
+
+
+def _retry_reason(error):
+    if isinstance(error, RateLimitError):
+        return "rate_limit"
+    return "server_error" if isinstance(error, APIStatusError) else "connection"
+
+
+class RateLimitGate:
+    """Admission control driven by the provider's rate-limit headers. Lives on the engine loop."""
+
+    def __init__(self):
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.limit_tokens = None
+        self.resume_at = 0.0  # time.monotonic() before which nothing is admitted
+
+    def hold(self, seconds):
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+    def holding(self):
+        return self.resume_at > time.monotonic()
+
+    def update(self, headers):
+        self.remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+        self.remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+        self.limit_tokens = _header_int(headers, "x-ratelimit-limit-tokens") or self.limit_tokens
+        if self.remaining_requests == 0:
+            self.hold(_parse_duration(headers.get("x-ratelimit-reset-requests")))
+        if (self.remaining_tokens is not None and self.limit_tokens
+                and self.remaining_tokens < LOW_TOKEN_WATERMARK * self.limit_tokens):
+            self.hold(_parse_duration(headers.get("x-ratelimit-reset-tokens")))
+
+    async def admit(self, estimated_tokens):
+        while True:
+            delay = self.resume_at - time.monotonic()
+            if delay <= 0 and self.remaining_tokens is not None and estimated_tokens > self.remaining_tokens:
+                # The headers lag behind in-flight requests; wait a moment for fresher numbers.
+                delay = 1.0
+                self.remaining_tokens = None
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        if self.remaining_requests is not None:
+            self.remaining_requests -= 1
+        if self.remaining_tokens is not None:
+            self.remaining_tokens -= estimated_tokens
+
+
+class Ticket:
+    """Handle for one submitted request: its future plus where it is in the queue."""
+
+    def __init__(self, engine, persona=None, model=None):
+        self._engine = engine
+        self.future = None
+        self.status = "queued"   # queued -> running -> (retrying -> queued ->) done
+        self.attempt = 0
+        self.persona = persona
+        self.model = model
+        self.queued_at = time.perf_counter()
+
+    def position(self):
+        """1-based place among requests waiting for admission, or 0 once running."""
+        return self._engine._position(self)
+
+    def describe(self):
+        if self.status == "retrying":
+            return f"⏳ The AI service is busy — retrying (attempt {self.attempt + 1} of {MAX_ATTEMPTS})…"
+        position = self.position()
+        if position:
+            return f"⏳ High demand right now — you are number {position} in the queue…"
+        return "✍️ Generating reply…"
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    def cancel(self):
+        return self.future.cancel()
+
+    def wait(self, timeout):
+        """Block up to `timeout` seconds; True once the request has finished."""
+        done, _ = concurrent.futures.wait([self.future], timeout=timeout)
+        return bool(done)
+
+
+class CompletionEngine:
+    def __init__(self, api_key, limits, max_in_flight=DEFAULT_MAX_IN_FLIGHT, base_url=None):
+        self.max_in_flight = max_in_flight
+        self._waiting = []
+        self._waiting_lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="completion-engine", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(api_key, limits, base_url), self._loop).result()
+
+    async def _setup(self, api_key, limits, base_url):
+        # Loop-bound objects have to be created on the engine's own loop.
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._gate = RateLimitGate()
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=DefaultAsyncHttpxClient(limits=limits),
+            max_retries=0,  # retries are handled here, with the rate-limit gate in the loop
+        )
+
+    def submit(self, persona=None, **params):
+        """Schedule a chat completion; the returned Ticket resolves to the `ChatCompletion`."""
+        ticket = self._enqueue(persona, params.get("model"))
+        ticket.future = asyncio.run_coroutine_threadsafe(self._complete(ticket, params), self._loop)
+        return ticket
+
+    def complete(self, on_wait=None, persona=None, **params):
+        """Run a chat completion on the engine loop and wait for the result."""
+        return self.wait(self.submit(persona, **params), on_wait)
+
+    def wait(self, ticket, on_wait=None):
+        """Wait for a submitted request's result.
+
+        `on_wait(ticket)` is called from the calling thread every POLL_INTERVAL
+        while the request is queued or backing off.
+        """
+        if on_wait is not None:
+            while not ticket.wait(POLL_INTERVAL):
+                if ticket.status != "running":
+                    on_wait(ticket)
+        return ticket.result()
+
+    def stream(self, on_wait=None, persona=None, **params):
+        """Yield the chunks of a streamed chat completion as they arrive.
+
+        Failures before the first chunk are retried like `complete()`; once
+        text has been yielded an error is raised to the caller.
+        """
+        chunks = queue.Queue()
+        ticket = self._enqueue(persona, params.get("model"))
+        ticket.future = asyncio.run_coroutine_threadsafe(self._stream(ticket, params, chunks), self._loop)
+        try:
+            while True:
+                try:
+                    chunk = chunks.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    if on_wait is not None and ticket.status != "running":
+                        on_wait(ticket)
+                    continue
+                if chunk is _STREAM_END:
+                    break
+                yield chunk
+            ticket.result()  # surface errors raised on the loop
+        finally:
+            ticket.cancel()
+
+    def busy(self):
+        """True while the rate-limit gate is holding requests back or any request waits for admission."""
+        with self._waiting_lock:
+            waiting = bool(self._waiting)
+        return waiting or self._gate.holding()
+
+    # ---- queue bookkeeping (called from script threads and the loop) ----
+
+    def _enqueue(self, persona=None, model=None):
+        ticket = Ticket(self, persona, model)
+        with self._waiting_lock:
+            self._waiting.append(ticket)
+        return ticket
+
+    def _set_status(self, ticket, status):
+        with self._waiting_lock:
+            ticket.status = status
+            if status == "queued":
+                self._waiting.insert(0, ticket)  # a retried request keeps its turn
+            elif ticket in self._waiting:
+                self._waiting.remove(ticket)
+
+    def _position(self, ticket):
+        with self._waiting_lock:
+            return self._waiting.index(ticket) + 1 if ticket in self._waiting else 0
+
+    # ---- loop side ----
+
+    def _retry_delay(self, error, attempt):
+        """Seconds to back off before retrying `error`, or None if it should not be retried."""
+        retry_after = 0.0
+        if isinstance(error, RateLimitError):
+            if error.code == "insufficient_quota":
+                return None
+            self._gate.update(error.response.headers)
+            retry_after = _retry_after(error.response.headers.get("retry-after"))
+        elif isinstance(error, APIStatusError):
+            if error.status_code < 500:
+                return None
+        elif not isinstance(error, APIConnectionError):
+            return None
+        backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+        delay = max(backoff, retry_after)
+        if isinstance(error, RateLimitError):
+            self._gate.hold(delay)  # hold everyone back, not just this request
+        return delay
+
+    async def _with_retries(self, ticket, params, call, retryable=lambda: True):
+        estimated = _estimate_request_tokens(params)
+        labels = {"persona": ticket.persona, "model": ticket.model}
+        try:
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                ticket.attempt = attempt
+                await self._gate.admit(estimated)
+                async with self._semaphore:
+                    self._set_status(ticket, "running")
+                    if attempt == 1:
+                        metrics.observe("queue", time.perf_counter() - ticket.queued_at, **labels)
+                    try:
+                        with metrics.timer("llm", **labels):
+                            result = await call()
+                        metrics.count("requests", "ok", **labels)
+                        return result
+                    except Exception as error:
+                        delay = self._retry_delay(error, attempt) if retryable() else None
+                        if delay is None or attempt == MAX_ATTEMPTS:
+                            metrics.count("requests", "error", **labels)
+                            metrics.count("errors", type(error).__name__, **labels)
+                            raise
+                        metrics.count("retries", _retry_reason(error), **labels)
+                        logger.info("Retrying %s in %.1fs (attempt %d): %s",
+                                    params.get("model"), delay, attempt, error)
+                self._set_status(ticket, "retrying")
+                await asyncio.sleep(delay)
+                self._set_status(ticket, "queued")
+        finally:
+            self._set_status(ticket, "done")
+
+    async def _complete(self, ticket, params):
+        async def call():
+            raw = await self.client.chat.completions.with_raw_response.create(**params)
+            self._gate.update(raw.headers)
+            completion = raw.parse()
+            metrics.count_usage(completion.usage, ticket.persona, ticket.model)
+            return completion
+        return await self._with_retries(ticket, params, call)
+
+    async def _stream(self, ticket, params, chunks):
+        delivered = False
+
+        async def call():
+            nonlocal delivered
+            started = time.perf_counter()
+            raw = await self.client.chat.completions.with_raw_response.create(stream=True, **params)
+            self._gate.update(raw.headers)
+            async for chunk in raw.parse():
+                if not delivered:
+                    metrics.observe("first_token", time.perf_counter() - started, ticket.persona, ticket.model)
+                if chunk.usage:
+                    metrics.count_usage(chunk.usage, ticket.persona, ticket.model)
+                chunks.put(chunk)
+                delivered = True
+        try:
+            # Once text has reached the student a retry would duplicate it, so only retry before that.
+            await self._with_retries(ticket, params, call, retryable=lambda: not delivered)
+        finally:
+            chunks.put(_STREAM_END)
+
+
+@contextmanager
+def queue_status(placeholder):
+    """Yield an `on_wait` callback showing a request's place in the queue in a Streamlit placeholder.
+
+    The notice is cleared when the block exits, whether the reply arrived or failed.
+    """
+    def show(ticket):
+        placeholder.info(ticket.describe())
+    try:
+        yield show
+    finally:
+        placeholder.empty()
+
+
+@st.cache_resource(show_spinner=False)
+def _build_engine(api_key, max_connections, max_keepalive_connections, keepalive_expiry, max_in_flight,
+                  base_url=None):
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    return CompletionEngine(api_key, limits, max_in_flight, base_url)
+
+
+def get_completion_engine():
+    """Return the process-wide engine; OPENAI_MAX_IN_FLIGHT caps concurrent requests."""
+    limits = pool_limits()
+    return _build_engine(
+        st.secrets["OPENAI_API_KEY"],
+        limits.max_connections,
+        limits.max_keepalive_connections,
+        limits.keepalive_expiry,
+        setting("OPENAI_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT),
+        base_url(),
+    )
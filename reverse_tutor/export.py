@@ -0,0 +1,278 @@
+"""Batch export of stored sessions for instructors.
+
+The apps' "Export" buttons build a file from one student's session, so
+collecting a class meant a download per student. This reads the session store
+(`reverse_tutor.store`) directly and writes every session of a persona in a
+date range to one archive:
+
+    python -m reverse_tutor.export --persona celeste --since 2026-10-01 --until 2026-10-14 -o week1.jsonl
+    python -m reverse_tutor.export --persona ben --db /srv/tutor/sessions.db -o ben.parquet
+
+Each record is one session: its persona, context, model, timestamps, the final
+state (conceded, hints used, conviction, scores, token usage) and the stored
+conversation. In `conversation` the opening trigger and hint requests appear as
+they were sent, so the archive shows exactly what the model saw. Dates are
+local and `--until` is inclusive.
+
+Sessions are streamed from a read-only connection one at a time and written in
+batches of BATCH_SIZE, so memory stays flat however many sessions there are.
+JSONL is written through a large buffer; Parquet (chosen by the `.parquet`
+suffix or --format) needs `pyarrow`, which is optional, and stores `scores` and
+`usage` as JSON strings because their keys differ between personas.
+
+`read_archive` streams the records of either kind of archive back in the shape
+`iter_sessions` yields them. Callers that need only some fields of a record
+(the instructor dashboard) pass `fields`, and only those columns and state
+keys are read. They may also ask for fields that are not exported but worked
+out in SQLite from the session's turns without reading them into Python
+(ANALYTICS_COLUMNS): the number of student messages and how many of them came
+before the bot conceded.
+"""
+import argparse
+import json
+import sqlite3
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pq = None
+
+from reverse_tutor.bots import GRADE_MARKER, HINT_PLACEHOLDER, parse_grade
+from reverse_tutor.personas import get_persona
+from reverse_tutor.store import DEFAULT_DB_PATH
+
+BATCH_SIZE = 256                # sessions per write
+WRITE_BUFFER = 1 << 20          # bytes buffered before a JSONL write hits the disk
+
+# Record field -> the SQL expression reading it; state keys are pulled out of the JSON in SQLite.
+COLUMNS = {
+    "session_id": "id",
+    "persona": "persona",
+    "context": "context",
+    "model": "model",
+    "created": "created",
+    "updated": "updated",
+    "bot_conceded": "json_extract(state, '$.conceded')",
+    "hints_used": "json_extract(state, '$.hints_used')",
+    "conviction": "json_extract(state, '$.conviction')",
+    "scores": "json_extract(state, '$.scores')",
+    "usage": "json_extract(state, '$.usage')",
+}
+FIELDS = tuple(COLUMNS) + ("conversation",)
+
+# Student messages: stored user turns other than the opening trigger (seq 0) and hint requests.
+_STUDENT_TURNS = (
+    "SELECT COUNT(*) FROM turns AS t WHERE t.session_id = sessions.id AND t.role = 'user' AND t.seq > 0"
+    " AND t.content NOT GLOB '" + HINT_PLACEHOLDER.replace("[", "[[]").format(number="*") + "'"
+)
+# Fields only `iter_sessions(fields=...)` callers ask for; never part of an export.
+ANALYTICS_COLUMNS = {
+    "grade_response": "json_extract(state, '$.grade_response')",
+    "student_turns": f"({_STUDENT_TURNS})",
+    # Student messages before the reply the bot conceded with; NULL if it has not conceded.
+    "concession_turn": (
+        "CASE WHEN json_extract(state, '$.conceded') THEN (SELECT (" + _STUDENT_TURNS + " AND t.seq < r.seq)"
+        " FROM turns AS r WHERE r.session_id = sessions.id AND r.role = 'assistant'"
+        " AND r.content = json_extract(sessions.state, '$.grade_response') ORDER BY r.seq LIMIT 1) END"
+    ),
+}
+SESSIONS_QUERY = "SELECT id AS _id, {columns} FROM sessions WHERE created >= ? AND created < ?"
+TURNS_QUERY = "SELECT seq, role, content FROM turns WHERE session_id = ? ORDER BY seq"
+PERSONAS_QUERY = "SELECT DISTINCT persona FROM sessions"
+
+
+def connect(path):
+    """A read-only connection, so exporting never blocks the apps' writes (the store runs in WAL mode)."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _day_start(day):
+    return datetime.combine(day, datetime.min.time()).timestamp()
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+def _json(default):
+    return lambda value: json.loads(value) if value is not None else default
+
+
+_DECODE = {
+    "created": _timestamp,
+    "updated": _timestamp,
+    "bot_conceded": bool,
+    "hints_used": lambda value: value or 0,
+    "scores": _json(None),
+    "usage": _json({}),
+}
+
+
+def stored_personas(conn):
+    """The keys of the personas that have stored sessions."""
+    return {row[0] for row in conn.execute(PERSONAS_QUERY)}
+
+
+def iter_sessions(conn, persona=None, since=None, until=None, fields=FIELDS):
+    """Yield one record per stored session created in [since, until] (dates), oldest first.
+
+    Records hold only the keys in `fields`; the conversation is read only if
+    "conversation" is one of them.
+    """
+    available = dict(COLUMNS, **ANALYTICS_COLUMNS)
+    columns = [name for name in available if name in fields]
+    query = SESSIONS_QUERY.format(columns=", ".join(f"{available[name]} AS {name}" for name in columns))
+    params = [
+        _day_start(since) if since else 0.0,
+        _day_start(until + timedelta(days=1)) if until else float("inf"),
+    ]
+    if persona:
+        query += " AND persona = ?"
+        params.append(persona)
+    for row in conn.execute(query + " ORDER BY created, id", params):
+        record = {name: _DECODE.get(name, lambda value: value)(row[name]) for name in columns}
+        if "conversation" in fields:
+            record["conversation"] = [dict(t) for t in conn.execute(TURNS_QUERY, (row["_id"],))]
+        yield record
+
+
+def session_scores(record):
+    """The session's numeric scores, or None if it has none.
+
+    Sessions graded in character only have their scores in the conceding
+    reply's grade block, read from `grade_response` if the record has it and
+    from the conversation otherwise.
+    """
+    if record["scores"] is not None or not record["bot_conceded"]:
+        return record["scores"]
+    categories = get_persona(record["persona"]).grade_categories
+    if "grade_response" in record:
+        replies = [record["grade_response"] or ""]
+    else:
+        replies = [t["content"] for t in record["conversation"]]
+    graded = [reply for reply in replies if GRADE_MARKER in reply]
+    return parse_grade(graded[0], categories) if categories and graded else None
+
+
+def _batches(records, size=BATCH_SIZE):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def write_jsonl(records, out):
+    """Write `records` to the text stream `out`, one JSON object per line; returns the count."""
+    count = 0
+    for batch in _batches(records):
+        out.writelines(json.dumps(r, ensure_ascii=False, default=_json_default) + "\n" for r in batch)
+        count += len(batch)
+    return count
+
+
+def parquet_schema():
+    timestamp = pa.timestamp("ms", tz="UTC")
+    turn = pa.struct([("seq", pa.int32()), ("role", pa.string()), ("content", pa.string())])
+    return pa.schema([
+        ("session_id", pa.string()),
+        ("persona", pa.string()),
+        ("context", pa.string()),
+        ("model", pa.string()),
+        ("created", timestamp),
+        ("updated", timestamp),
+        ("bot_conceded", pa.bool_()),
+        ("hints_used", pa.int32()),
+        ("conviction", pa.int32()),
+        ("scores", pa.string()),
+        ("usage", pa.string()),
+        ("conversation", pa.list_(turn)),
+    ])
+
+
+def write_parquet(records, path):
+    """Write `records` to a Parquet file, one row group per batch; returns the count."""
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow); use a .jsonl output instead.")
+    schema = parquet_schema()
+    count = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in _batches(records):
+            rows = [dict(r, scores=json.dumps(r["scores"]) if r["scores"] is not None else None,
+                         usage=json.dumps(r["usage"])) for r in batch]
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            count += len(batch)
+    return count
+
+
+def read_archive(path):
+    """Yield the session records in a JSONL or Parquet archive written by `export`."""
+    if str(path).endswith(".parquet"):
+        if pq is None:
+            raise RuntimeError("Reading a Parquet archive needs pyarrow (pip install pyarrow).")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=BATCH_SIZE):
+            for record in batch.to_pylist():
+                record["scores"] = json.loads(record["scores"]) if record["scores"] is not None else None
+                record["usage"] = json.loads(record["usage"])
+                yield record
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                record["created"] = datetime.fromisoformat(record["created"])
+                record["updated"] = datetime.fromisoformat(record["updated"])
+                yield record
+
+
+def export(db_path, output, persona=None, since=None, until=None, fmt=None):
+    """Export matching sessions from `db_path` to `output` ("-" for stdout); returns the number written."""
+    fmt = fmt or ("parquet" if str(output).endswith(".parquet") else "jsonl")
+    conn = connect(db_path)
+    try:
+        records = iter_sessions(conn, persona, since, until)
+        if fmt == "parquet":
+            if output == "-":
+                raise ValueError("Parquet cannot be written to stdout; give an output file.")
+            return write_parquet(records, output)
+        if output == "-":
+            return write_jsonl(records, sys.stdout)
+        with open(output, "w", encoding="utf-8", buffering=WRITE_BUFFER) as out:
+            return write_jsonl(records, out)
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export stored tutor sessions to one JSONL or Parquet archive.")
+    parser.add_argument("-o", "--output", default="-", help="archive file, or - for JSONL on stdout")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="session database (SESSION_DB_PATH)")
+    parser.add_argument("--persona", help="persona key, e.g. celeste (default: all)")
+    parser.add_argument("--since", type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    parser.add_argument("--until", type=date.fromisoformat, help="last day, YYYY-MM-DD (inclusive)")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), help="default: from the output suffix")
+    args = parser.parse_args(argv)
+
+    try:
+        count = export(args.db, args.output, args.persona, args.since, args.until, args.format)
+    except (RuntimeError, ValueError, sqlite3.OperationalError) as e:
+        parser.error(str(e))
+    print(f"Exported {count} sessions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
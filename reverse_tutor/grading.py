@@ -0,0 +1,164 @@
+"""Structured grading through a JSON-schema completion.
+
+The graded personas (Celeste, Ben, Boris) used to be scored by splitting the
+conceding reply on `---GRADE---` and matching each line with `startswith`.
+When the model changed the layout of that block, `parse_grade` quietly returned
+a partial dict and the score card showed "—".
+
+Grading is now a separate request whose reply must match a per-persona JSON
+schema: one integer from 1 to SCORE_MAX per rubric category plus feedback.
+Scores are kept as numbers and the total is added up here rather than trusted
+from the model.
+
+The request is a background job on the process-wide `GradingQueue`, keyed by
+session. It starts as soon as the concession is seen (mid-stream when
+streaming), is graded against the session's full transcript from the store
+rather than the compacted payload, and never blocks a chat turn: the apps show
+the concession and the follow-up question right away and poll until the scores
+are in. Because the job belongs to the session rather than to the bot object, a
+reloaded page picks up the same job.
+
+With structured grading the persona prompts' grade template is replaced by
+an empty `---GRADE---` block (see `defer_grade_block`), which still marks the
+concession but no longer makes the concession turn the longest of the session
+or gets cut off by `max_tokens`.
+
+Set `STRUCTURED_GRADING = false` in `.streamlit/secrets.toml` to keep the
+in-character grade block and grade from it only.
+"""
+import json
+import re
+import threading
+import time
+
+import streamlit as st
+
+from reverse_tutor.clients import setting
+from reverse_tutor.prompts import PromptLayout
+
+SCORE_MAX = 5               # every rubric category is scored 1..SCORE_MAX
+GRADE_POLL_INTERVAL = 1.0   # seconds between the apps' checks for a finished grading job
+JOB_TTL = 3600.0            # seconds a finished job waits to be collected before it is dropped
+GRADING_PARAMS = {"temperature": 0.0, "max_tokens": 300}
+GRADE_REQUEST = (
+    "The student has convinced you and the debate is over. Step out of character and grade the "
+    "student's side of the conversation above, using the grading rubric and anchors in your "
+    "instructions. Feedback is two sentences: one strength and one improvement suggestion."
+)
+
+
+_GRADE_TEMPLATE = re.compile(r"---GRADE---\n.*?---END GRADE---", re.DOTALL)
+DEFERRED_GRADE_BLOCK = (
+    "---GRADE---\n---END GRADE---\n"
+    "(Leave the block empty: the scores are recorded separately after you concede.)"
+)
+
+
+def structured_grading_enabled():
+    return setting("STRUCTURED_GRADING", True)
+
+
+def defer_grade_block(prompt):
+    """`prompt` (a string or PromptLayout) with its grade template emptied."""
+    if isinstance(prompt, PromptLayout):
+        return PromptLayout(defer_grade_block(prompt.static), prompt.context)
+    return _GRADE_TEMPLATE.sub(DEFERRED_GRADE_BLOCK, prompt)
+
+
+def grade_schema(categories):
+    """The `response_format` asking for an integer score per category plus feedback."""
+    # Range keywords are not accepted by every model in strict mode, so the range is checked in parse_scores.
+    properties = {cat: {"type": "integer", "description": f"1 to {SCORE_MAX}"} for cat in categories}
+    properties["Feedback"] = {"type": "string"}
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "grade",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": properties,
+                "required": list(properties),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+def grading_params(categories, model, messages):
+    """Completion parameters for grading the conversation in `messages` (a chat request payload)."""
+    return dict(
+        GRADING_PARAMS,
+        model=model,
+        messages=[*messages, {"role": "user", "content": GRADE_REQUEST}],
+        response_format=grade_schema(categories),
+    )
+
+
+def parse_scores(content, categories):
+    """Numeric scores (plus Total and Feedback) from a grading reply; ValueError if any category is missing."""
+    data = json.loads(content)
+    scores = {}
+    for cat in categories:
+        score = data.get(cat)
+        if not isinstance(score, int) or not 1 <= score <= SCORE_MAX:
+            raise ValueError(f"grading reply has no valid score for {cat!r}")
+        scores[cat] = score
+    scores["Total"] = sum(scores.values())
+    scores["Feedback"] = str(data.get("Feedback", "")).strip()
+    return scores
+
+
+def score_labels(scores):
+    """`scores` with "4/5"-style strings for display, or None."""
+    if not scores:
+        return None
+    categories = [key for key in scores if key not in ("Total", "Feedback")]
+    labels = {cat: f"{scores[cat]}/{SCORE_MAX}" for cat in categories}
+    if "Total" in scores:
+        labels["Total"] = f"{scores['Total']}/{SCORE_MAX * len(categories)}"
+    labels["Feedback"] = scores.get("Feedback", "")
+    return labels
+
+
+class GradingQueue:
+    """Grading jobs keyed by session id, run on the completion engine."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}      # key -> (Ticket, submitted at)
+
+    def submit(self, key, engine, params):
+        """Start grading for `key` unless a job for it is already queued or waiting to be collected."""
+        now = time.monotonic()
+        with self._lock:
+            self._jobs = {k: job for k, job in self._jobs.items()
+                          if not (job[0].done() and now - job[1] > JOB_TTL)}
+            if key not in self._jobs:
+                self._jobs[key] = (engine.submit(**params), now)
+
+    def has_job(self, key):
+        with self._lock:
+            return key in self._jobs
+
+    def pending(self, key):
+        with self._lock:
+            job = self._jobs.get(key)
+        return job is not None and not job[0].done()
+
+    def take(self, key):
+        """The finished job's completion, removing the job; None while it runs or if there is none.
+
+        Raises the job's error if the request failed.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or not job[0].done():
+                return None
+            del self._jobs[key]
+        return job[0].result()
+
+
+@st.cache_resource(show_spinner=False)
+def get_grading_queue():
+    return GradingQueue()
@@ -0,0 +1,161 @@
+"""Token-budgeted history compaction for long debates.
+
+`get_response` used to resend the whole transcript every turn, so prompt size
+grew with every exchange. `HistoryCompactor` keeps the most recent turns
+verbatim and folds older ones into a running summary. Summaries are submitted
+to the completion engine and picked up on a later turn, so the student's turn
+never waits on them; until a summary lands the full history is sent as before.
+"""
+import logging
+
+from reverse_tutor.prompts import prompt_text, system_messages
+from reverse_tutor.tokens import count_prompt_tokens
+
+SUMMARY_MODEL = "gpt-4o-mini"
+DEFAULT_TOKEN_BUDGET = 3000   # unsummarised history tokens allowed before folding starts
+DEFAULT_KEEP_TURNS = 6        # most recent user/assistant exchanges always sent verbatim
+
+SUMMARY_INSTRUCTIONS = """You maintain the running memory of a tutoring debate between a student and a role-played character.
+Merge the previous summary and the new transcript excerpt into one updated summary of at most 200 words.
+Preserve precisely:
+- every argument the student has made, and whether the character accepted it, pushed back, or rejected it
+- how many distinct points the character has accepted so far
+- hints already given, so they are not repeated
+Write in the third person. Do not add anything that is not in the transcript."""
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token plus per-message overhead)."""
+    return len(text) // 4 + 4
+
+
+def _history_messages(history, start, end=None):
+    if hasattr(history, "api_messages"):
+        return history.api_messages(start, end)
+    return [{"role": m["role"], "content": m["content"]} for m in history[start:end]]
+
+
+def _starts_exchange(history, index):
+    # True if the first sent message at or after `index` is the student's, or there is none.
+    for i in range(index, len(history)):
+        sent = _history_messages(history, i, i + 1)
+        if sent:
+            return sent[0]["role"] == "user"
+    return True
+
+
+def _history_tokens(history, start):
+    if hasattr(history, "tokens_between"):
+        return history.tokens_between(start)
+    return sum(estimate_tokens(m["content"]) for m in history[start:])
+
+
+class HistoryCompactor:
+    def __init__(self, engine, token_budget=DEFAULT_TOKEN_BUDGET, keep_turns=DEFAULT_KEEP_TURNS,
+                 summary_model=SUMMARY_MODEL, summary_focus="", persona=None):
+        self.engine = engine
+        self.persona = persona      # labels the summary requests in reverse_tutor.metrics
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.summary_model = summary_model
+        self.summary_focus = summary_focus
+        self.summary = ""
+        self.folded = 0       # number of leading history messages covered by `summary`
+        self._job = None      # (future, end_index) of the summary being generated
+
+    def build_messages(self, system_prompt, history, pinned_state=None):
+        """Return the API payload: system prompt, memory block and the unsummarised history.
+
+        `system_prompt` may be a plain string or a PromptLayout; the memory
+        block goes after it so the cacheable prefix is left untouched.
+
+        `pinned_state` lists facts the bot needs verbatim regardless of what
+        the summary kept (current conviction, hints used, ...).
+        """
+        self._collect()
+        self._maybe_schedule(history)
+
+        messages = system_messages(system_prompt)
+        if self.summary:
+            memory = f"# EARLIER IN THIS CONVERSATION (summary)\n{self.summary}"
+            if pinned_state:
+                memory += "\n\n# CURRENT STATE\n" + "\n".join(f"- {line}" for line in pinned_state)
+            messages.append({"role": "system", "content": memory})
+        messages.extend(_history_messages(history, self.folded))
+        return messages
+
+    def payload_tokens(self, system_prompt, history, model="gpt-4o"):
+        """Size of the next request's system prompt, memory block and history, without re-tokenising."""
+        total = count_prompt_tokens(prompt_text(system_prompt), model) + _history_tokens(history, self.folded)
+        if self.summary:
+            total += count_prompt_tokens(self.summary, model)
+        return total
+
+    def reset(self, folded=0):
+        """Start over on a reloaded history whose first `folded` messages the summary covers."""
+        self.folded = folded
+        self._job = None
+
+    def release(self, history, keep=0):
+        """Drop the messages already folded into the summary from the front of `history`.
+
+        The last `keep` messages stay even if folded (they may still be on
+        screen). Returns how many were dropped. The caller is expected to have
+        stored them elsewhere; they are never sent again.
+        """
+        count = min(self.folded, len(history) - keep)
+        if count <= 0 or not hasattr(history, "drop_prefix"):
+            return 0
+        history.drop_prefix(count)
+        self.folded -= count
+        if self._job is not None:
+            future, end = self._job
+            self._job = (future, end - count)
+        return count
+
+    def _collect(self):
+        if self._job is None or not self._job[0].done():
+            return
+        future, end = self._job
+        self._job = None
+        try:
+            self.summary = future.result().choices[0].message.content.strip()
+            self.folded = end
+        except Exception:
+            logger.warning("History summary failed; sending full history", exc_info=True)
+
+    def _maybe_schedule(self, history):
+        if self._job is not None:
+            return
+        if _history_tokens(history, self.folded) <= self.token_budget:
+            return
+        # Fold whole exchanges only, leaving the last `keep_turns` exchanges verbatim.
+        # Unsent turns (a failed message, a failed hint) make the positions' parity
+        # meaningless, so step back until the next sent message opens an exchange.
+        end = len(history) - 2 * self.keep_turns
+        while end > self.folded and not _starts_exchange(history, end):
+            end -= 1
+        if end <= self.folded:
+            return
+        future = self._summarise(self.summary, _history_messages(history, self.folded, end))
+        self._job = (future, end)
+
+    def _summarise(self, previous, excerpt):
+        transcript = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in excerpt)
+        instructions = SUMMARY_INSTRUCTIONS
+        if self.summary_focus:
+            instructions += "\n" + self.summary_focus
+        return self.engine.submit(
+            persona=self.persona,
+            model=self.summary_model,
+            messages=[
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": (
+                    f"PREVIOUS SUMMARY:\n{previous or '(none)'}\n\nNEW TRANSCRIPT EXCERPT:\n{transcript}"
+                )},
+            ],
+            temperature=0.2,
+            max_tokens=350,
+        )
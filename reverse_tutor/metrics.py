@@ -0,0 +1,256 @@
+"""Per-turn latency and token metrics.
+
+Nothing showed where the time in a turn went: waiting in the engine's queue,
+the API call itself, parsing the reply for conviction, concession and grades,
+drawing the chat, or the `st.rerun()` after it. The hot paths now record into
+one process-wide `MetricsRegistry`, labelled by persona and model:
+
+- stage timings (`tutor_stage_seconds`, a histogram per stage): `queue` and
+  `llm` per request and `first_token` per stream in the engine, `turn` and
+  `parse` per reply in `PersonaBot`, `render` for drawing the transcript and
+  `rerun` from `st.rerun()` to the start of the next run in the apps;
+- counters: `tutor_tokens_total` (by kind: prompt, cached_prompt, completion),
+  `tutor_requests_total` (by outcome), `tutor_retries_total` and
+  `tutor_errors_total` (by error type) from the engine, and
+  `tutor_reruns_total` from the apps.
+
+Recording takes one lock and a bisect, a microsecond or two. Set these in
+`.streamlit/secrets.toml` to look at them:
+
+    METRICS_PORT = 9464          # serve /metrics on 127.0.0.1 for Prometheus
+    ADMIN_PASSWORD = "..."       # unlock the metrics panel in the sidebar
+
+Each Streamlit process keeps its own registry, so give each app its own port.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+
+from reverse_tutor.clients import setting
+
+# Upper bounds (seconds) of the stage histogram buckets; the last bucket is +Inf.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNTERS = {
+    "tokens": ("kind", "Tokens reported by the API."),
+    "requests": ("outcome", "Completion requests by outcome."),
+    "retries": ("reason", "Completion attempts that were retried."),
+    "errors": ("error", "Completion requests that failed, by error type."),
+    "reruns": ("scope", "st.rerun() calls made by the apps."),
+}
+PREFIX = "tutor"
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the `q` quantile (Prometheus-style estimate)."""
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS + (float("inf"),), self.buckets):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """Thread-safe stage histograms and counters keyed by (persona, model, ...)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}    # (persona, model, stage) -> Histogram
+        self._counters = {}      # (name, persona, model, label value) -> number
+
+    def observe(self, stage, seconds, persona=None, model=None):
+        key = (persona or "", model or "", stage)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, label, value=1, persona=None, model=None):
+        key = (name, persona or "", model or "", label)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, stage, persona=None, model=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, persona, model)
+
+    def stages(self):
+        """One row per (persona, model, stage): count, mean and estimated p50/p95 in milliseconds."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            return [{
+                "persona": persona, "model": model, "stage": stage, "count": h.count,
+                "mean_ms": h.total / h.count * 1000, "p50_ms": h.quantile(0.5) * 1000,
+                "p95_ms": h.quantile(0.95) * 1000,
+            } for (persona, model, stage), h in items]
+
+    def counters(self):
+        """One row per (persona, model) with a column per counter and label value."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+        columns = sorted({f"{name}:{label}" for name, _, _, label in (key for key, _ in counters)})
+        rows = {}
+        for (name, persona, model, label), value in counters:
+            row = rows.setdefault((persona, model), dict({"persona": persona, "model": model}, **dict.fromkeys(columns, 0)))
+            row[f"{name}:{label}"] = value
+        return list(rows.values())
+
+    def exposition(self):
+        """Everything in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        name = f"{PREFIX}_stage_seconds"
+        lines += [f"# HELP {name} Time spent per stage of a turn.", f"# TYPE {name} histogram"]
+        for (persona, model, stage), h in histograms:
+            labels = _labels(persona=persona, model=model, stage=stage)
+            seen = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), h.buckets):
+                seen += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{{{labels},le=\"{le}\"}} {seen}")
+            lines.append(f"{name}_sum{{{labels}}} {h.total!r}")
+            lines.append(f"{name}_count{{{labels}}} {h.count}")
+        for counter, (label_name, help_text) in COUNTERS.items():
+            name = f"{PREFIX}_{counter}_total"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (key, persona, model, label), value in counters:
+                if key == counter:
+                    lines.append(f"{name}{{{_labels(persona=persona, model=model, **{label_name: label})}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+REGISTRY = MetricsRegistry()
+observe = REGISTRY.observe
+count = REGISTRY.count
+timer = REGISTRY.timer
+
+
+def count_usage(usage, persona=None, model=None):
+    """Count the tokens in an API `usage` object."""
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    count("tokens", "prompt", usage.prompt_tokens or 0, persona, model)
+    count("tokens", "cached_prompt", getattr(details, "cached_tokens", None) or 0, persona, model)
+    count("tokens", "completion", usage.completion_tokens or 0, persona, model)
+
+
+# ---- scrape endpoint ----
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.exposition().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@st.cache_resource(show_spinner=False)
+def _serve(port):
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    except OSError as e:
+        logger.warning("Metrics endpoint not started on port %d: %s", port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-endpoint", daemon=True).start()
+    return server
+
+
+def metrics_server():
+    """The process's /metrics server if METRICS_PORT is set, started on first use; else None."""
+    port = setting("METRICS_PORT", 0)
+    return _serve(port) if port else None
+
+
+# ---- app hooks ----
+
+_RERUN_KEY = "_metrics_rerun"
+
+
+def page_started():
+    """Call at the top of an app: starts the endpoint and times the rerun that led here, if any."""
+    metrics_server()
+    pending = st.session_state.pop(_RERUN_KEY, None)
+    if pending is not None:
+        persona, model, started = pending
+        observe("rerun", time.perf_counter() - started, persona, model)
+
+
+def rerun(persona, model, scope="app"):
+    """`st.rerun()`, counted and timed under `persona` and `model`."""
+    count("reruns", scope, persona=persona, model=model)
+    if scope == "app":
+        st.session_state[_RERUN_KEY] = (persona, model, time.perf_counter())
+    st.rerun(scope=scope)
+
+
+@st.fragment
+def admin_panel():
+    """Sidebar expander with this process's metrics, shown once ADMIN_PASSWORD is entered."""
+    password = st.secrets.get("ADMIN_PASSWORD")
+    if not password:
+        return
+    with st.expander("📈 Metrics (admin)"):
+        if not st.session_state.get("metrics_admin"):
+            entered = st.text_input("Admin password", type="password", key="metrics_password")
+            if entered != password:
+                if entered:
+                    st.error("😕 Password incorrect")
+                return
+            st.session_state.metrics_admin = True
+        st.button("↻ Refresh", key="metrics_refresh")
+        server = metrics_server()
+        if server is not None:
+            st.caption(f"Scrape endpoint: http://127.0.0.1:{server.server_address[1]}/metrics")
+        stages = REGISTRY.stages()
+        if not stages:
+            st.caption("Nothing recorded yet.")
+            return
+        st.markdown("**Stage latency (ms)**")
+        st.dataframe([{k: round(v, 1) if isinstance(v, float) else v for k, v in row.items()} for row in stages],
+                     hide_index=True)
+        st.markdown("**Counters**")
+        st.dataframe(REGISTRY.counters(), hide_index=True)
@@ -0,0 +1,382 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Load and latency tests used to cost real API money, and CI has no network.
+This server answers `POST /v1/chat/completions` with scripted persona replies,
+both streamed (SSE) and non-streamed, so the whole request path runs for real:
+the engine's retries and rate-limit gate, the conviction tag and grade-block
+parsing in the apps, and the token usage accounting. Requests with a
+`json_schema` response format (structured grading) get a JSON object filled in
+to match the schema.
+
+Replies follow the persona's own system prompt:
+
+- if it asks for a `[CONVICTION:XX]` tag, every reply ends with one, falling
+  by `conviction_step` per student turn;
+- once the conviction drops to 15, the student has had `concede_after` turns,
+  or their message contains "concede", the reply concedes. If the system prompt
+  contains a `---GRADE---` template, a filled-in grade block with the same
+  categories is added.
+
+Latency, token rate, error injection and the simulated rate limit are
+configured through `MockConfig`. Run the server from the command line:
+
+    python -m reverse_tutor.mock_server --port 8765 --latency 0.4 --error-rate 0.05
+
+Then point the apps at it in `.streamlit/secrets.toml`:
+
+    OPENAI_BASE_URL = "http://127.0.0.1:8765/v1"
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8765
+CONCESSION_CONVICTION = 15
+GRADE_LINE = re.compile(r"^([A-Za-z][\w /&-]*):\s*X+/(\d+)\s*$", re.MULTILINE)
+CONVICTION_TAG = re.compile(r"\[CONVICTION:\s*(\d{1,3})\]")
+CONVICTION_STATE = re.compile(r"conviction is (\d{1,3})/100")
+
+BANTER = [
+    "Hmm, I'm not convinced. That sounds like a detail that doesn't change the big picture.",
+    "Interesting, but you haven't explained the mechanism. Why would that matter here?",
+    "I've heard that before. Can you give me something more concrete?",
+    "Okay, that's a fair point, but I still think my view holds overall.",
+]
+
+
+class MockConfig:
+    """Knobs for the stand-in server. Times are in seconds."""
+
+    def __init__(self, latency=0.3, latency_jitter=0.1, latency_dist="lognormal", tokens_per_second=60.0,
+                 error_rate=0.0, rate_limit_rate=0.0, requests_per_minute=0, tokens_per_minute=0,
+                 conviction_step=20, concede_after=5, seed=None):
+        self.latency = latency                  # mean time to first token
+        self.latency_jitter = latency_jitter    # spread of the latency distribution
+        self.latency_dist = latency_dist        # "fixed", "uniform", "normal" or "lognormal"
+        self.tokens_per_second = tokens_per_second  # generation speed after the first token; 0 = instant
+        self.error_rate = error_rate            # share of requests failed with a random 5xx
+        self.rate_limit_rate = rate_limit_rate  # share of requests failed with a 429
+        self.requests_per_minute = requests_per_minute  # simulated account limits; 0 = unlimited
+        self.tokens_per_minute = tokens_per_minute
+        self.conviction_step = conviction_step
+        self.concede_after = concede_after
+        self.random = random.Random(seed)
+
+    def sample_latency(self):
+        if self.latency_dist == "fixed" or not self.latency_jitter:
+            return self.latency
+        if self.latency_dist == "uniform":
+            delay = self.random.uniform(self.latency - self.latency_jitter, self.latency + self.latency_jitter)
+        elif self.latency_dist == "normal":
+            delay = self.random.gauss(self.latency, self.latency_jitter)
+        elif self.latency <= 0:
+            return 0.0
+        else:
+            # Mean `latency` and standard deviation `latency_jitter`, with a long right tail like real APIs.
+            sigma2 = math.log1p((self.latency_jitter / self.latency) ** 2)
+            delay = self.random.lognormvariate(math.log(self.latency) - sigma2 / 2, math.sqrt(sigma2))
+        return max(delay, 0.0)
+
+
+class RateWindow:
+    """Fixed one-minute window of requests and tokens, reported in `x-ratelimit-*` headers."""
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.requests = 0
+        self.tokens = 0
+
+    def take(self, tokens):
+        """Count one request; return (headers, allowed)."""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 60:
+                self.window_start, self.requests, self.tokens = now, 0, 0
+            reset = f"{max(60 - (now - self.window_start), 0):.3f}s"
+            rpm = self.config.requests_per_minute or 10_000
+            tpm = self.config.tokens_per_minute or 10_000_000
+            allowed = self.requests < rpm and self.tokens + tokens <= tpm
+            if allowed:
+                self.requests += 1
+                self.tokens += tokens
+            headers = {
+                "x-ratelimit-limit-requests": str(rpm),
+                "x-ratelimit-remaining-requests": str(rpm - self.requests),
+                "x-ratelimit-reset-requests": reset,
+                "x-ratelimit-limit-tokens": str(tpm),
+                "x-ratelimit-remaining-tokens": str(tpm - self.tokens),
+                "x-ratelimit-reset-tokens": reset,
+            }
+            return headers, allowed
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _message_text(message):
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def _grade_block(system_prompt, rng):
+    """Fill in the grade template found in the persona prompt, keeping its categories."""
+    template = system_prompt.split("---GRADE---", 1)[1].split("---END GRADE---", 1)[0]
+    lines, total, out_of = [], 0, 0
+    for name, maximum in GRADE_LINE.findall(template):
+        if name.strip().lower() == "total":
+            continue
+        maximum = int(maximum)
+        score = rng.randint(max(1, maximum // 2), maximum)
+        total += score
+        out_of += maximum
+        lines.append(f"{name.strip()}: {score}/{maximum}")
+    if not lines:
+        return "---GRADE---\n---END GRADE---"     # the template was left empty for structured grading
+    lines.append(f"Total: {total}/{out_of}")
+    lines.append("Feedback: Clear, mechanistic reasoning throughout. Citing a specific study would make it stronger.")
+    return "---GRADE---\n" + "\n".join(lines) + "\n---END GRADE---"
+
+
+def _schema_reply(schema, rng):
+    """A JSON object with every property of `schema`: integers 1-5 (the rubric range) and a feedback string."""
+    reply = {}
+    for name, spec in schema.get("properties", {}).items():
+        if spec.get("type") == "integer":
+            reply[name] = rng.randint(2, 5)
+        else:
+            reply[name] = "Clear, mechanistic reasoning throughout. Citing a specific study would make it stronger."
+    return json.dumps(reply)
+
+
+def script_reply(body, config):
+    """The scripted assistant reply for a chat completion request body."""
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return _schema_reply(response_format["json_schema"]["schema"], config.random)
+    messages = body.get("messages", [])
+    system_prompt = "\n".join(_message_text(m) for m in messages if m.get("role") in ("system", "developer"))
+    last = _message_text(messages[-1]) if messages else ""
+    student_turns = sum(1 for m in messages if m.get("role") == "user")
+
+    if "requesting hint" in last:
+        reply = "Think about what happens to the light, or the particle, before it ever reaches where you expect it to."
+    else:
+        reply = config.random.choice(BANTER)
+
+    conviction = None
+    if "[CONVICTION:" in system_prompt:
+        previous = [int(c) for m in messages if m.get("role") == "assistant"
+                    for c in CONVICTION_TAG.findall(_message_text(m))]
+        pinned = CONVICTION_STATE.findall(system_prompt)
+        start = previous[-1] if previous else int(pinned[-1]) if pinned else 95
+        conviction = max(start - (0 if "requesting hint" in last else config.conviction_step), 5)
+
+    conceded = "you have already conceded" in system_prompt.lower() or any(
+        "---GRADE---" in _message_text(m) or "I concede" in _message_text(m)
+        for m in messages if m.get("role") == "assistant"
+    )
+    concede_now = not conceded and "requesting hint" not in last and (
+        "concede" in last.lower()
+        or student_turns >= config.concede_after
+        or (conviction is not None and conviction <= CONCESSION_CONVICTION)
+    )
+    if concede_now:
+        reply = "Okay, that's fair — I concede. You've shown me what I was missing."
+        if "---GRADE---" in system_prompt:
+            reply += "\n\n" + _grade_block(system_prompt, config.random)
+        if conviction is not None:
+            conviction = min(conviction, CONCESSION_CONVICTION - 5)
+    elif conceded:
+        reply = "Now that I've come round, what experiment would you run to check it?"
+    if conviction is not None:
+        reply += f"\n[CONVICTION:{conviction}]"
+    return reply
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = "ReverseTutorMock/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=()):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in dict(headers).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, message, error_type, code=None, headers=()):
+        self._send_json(status, {"error": {"message": message, "type": error_type, "param": None, "code": code}},
+                        headers)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self._error(400, "Request body is not valid JSON.", "invalid_request_error")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._error(404, f"Unknown path {self.path}", "invalid_request_error")
+
+        config = self.server.config
+        prompt_tokens = sum(_estimate_tokens(_message_text(m)) + 4 for m in body.get("messages", []))
+        headers, allowed = self.server.window.take(prompt_tokens + (body.get("max_tokens") or 0))
+        roll = config.random.random()
+        if not allowed or roll < config.rate_limit_rate:
+            headers["retry-after"] = "1"
+            return self._error(429, "Rate limit reached (mock).", "requests", "rate_limit_exceeded", headers)
+        if roll < config.rate_limit_rate + config.error_rate:
+            status = config.random.choice((500, 502, 503))
+            return self._error(status, "The server had an error (mock).", "server_error", headers=headers)
+
+        reply = script_reply(body, config)
+        completion_tokens = _estimate_tokens(reply)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": self.server.cached_tokens(body.get("messages", []))},
+        }
+        time.sleep(config.sample_latency())
+        if body.get("stream"):
+            self._stream(body, reply, usage, headers)
+        else:
+            if config.tokens_per_second:
+                time.sleep(completion_tokens / config.tokens_per_second)
+            self._send_json(200, {
+                "id": f"chatcmpl-mock{self.server.next_id()}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            }, headers)
+
+    def _stream(self, body, reply, usage, headers):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.close_connection = True
+
+        base = {"id": f"chatcmpl-mock{self.server.next_id()}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": body.get("model", "mock")}
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        delay = 1 / self.server.config.tokens_per_second if self.server.config.tokens_per_second else 0
+
+        def send(choices, **extra):
+            self.wfile.write(f"data: {json.dumps(dict(base, choices=choices, **extra))}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            send([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+            for piece in re.findall(r"\S*\s*", reply):  # roughly one token per word
+                if piece:
+                    send([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+                    time.sleep(delay)
+            send([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if include_usage:
+                send([], usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client cancelled the stream
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config=None, verbose=False):
+        super().__init__(address, MockHandler)
+        self.config = config or MockConfig()
+        self.window = RateWindow(self.config)
+        self.verbose = verbose
+        self._lock = threading.Lock()
+        self._count = 0
+        self._seen_prefixes = set()
+
+    def next_id(self):
+        with self._lock:
+            self._count += 1
+            return self._count
+
+    def cached_tokens(self, messages):
+        """Mimic provider prefix caching: a repeated first system message is cached in 128-token blocks."""
+        if not messages:
+            return 0
+        first = _message_text(messages[0])
+        key = hashlib.sha1(first.encode()).hexdigest()
+        with self._lock:
+            seen = key in self._seen_prefixes
+            self._seen_prefixes.add(key)
+        tokens = _estimate_tokens(first)
+        return (tokens // 128) * 128 if seen and tokens >= 1024 else 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start(config=None, host="127.0.0.1", port=0, verbose=False):
+    """Serve in a daemon thread and return the server; port 0 picks a free port (see `server.base_url`)."""
+    server = MockServer((host, port), config, verbose)
+    threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in for the Reverse Tutor bots.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.3, help="mean seconds to first token")
+    parser.add_argument("--latency-jitter", type=float, default=0.1)
+    parser.add_argument("--latency-dist", choices=("fixed", "uniform", "normal", "lognormal"), default="lognormal")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="0 sends the reply at once")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 5xx")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument("--rpm", type=int, default=0, help="simulated requests-per-minute limit")
+    parser.add_argument("--tpm", type=int, default=0, help="simulated tokens-per-minute limit")
+    parser.add_argument("--conviction-step", type=int, default=20)
+    parser.add_argument("--concede-after", type=int, default=5, help="student turns before the bot concedes")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        latency=args.latency, latency_jitter=args.latency_jitter, latency_dist=args.latency_dist,
+        tokens_per_second=args.tokens_per_second, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+        conviction_step=args.conviction_step, concede_after=args.concede_after, seed=args.seed,
+    )
+    server = MockServer((args.host, args.port), config, args.verbose)
+    print(f"Mock OpenAI endpoint on {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Warm pool of pre-generated opening statements.
+
+Every new session (and every Reset) used to block on a completion just to get
+the bot's first line, so a class logging in at once hit the API all together.
+The pool keeps a few varied openings ready per (persona, scenario, model) key,
+hands one out instantly and tops itself back up in background threads.
+Apps warm their keys when a page first loads (`Persona.warm_openings`), so the
+pool is usually full before anyone asks for an opening.
+"""
+import logging
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from reverse_tutor.clients import setting
+from reverse_tutor.prompts import system_messages
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_WORKERS = 4
+
+logger = logging.getLogger(__name__)
+
+
+def generate_opening(engine, model, system_prompt, trigger, **params):
+    """Run the hidden opening trigger against `system_prompt` and return the raw reply."""
+    completion = engine.complete(
+        model=model,
+        messages=system_messages(system_prompt) + [{"role": "user", "content": trigger}],
+        **params,
+    )
+    return completion.choices[0].message.content.strip()
+
+
+class OpeningPool:
+    def __init__(self, size=DEFAULT_POOL_SIZE, workers=DEFAULT_WORKERS):
+        self.size = size
+        self._ready = defaultdict(deque)
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="opening-pool")
+
+    def take(self, key, generate):
+        """Return a ready opening for `key`, generating one inline only if the pool is empty.
+
+        `generate` is a zero-argument callable producing one opening; it runs in
+        worker threads, so it must not touch `st.session_state`. The refill is
+        scheduled before any inline call, so a cold key starts filling at once.
+        Errors from the inline call propagate to the caller.
+        """
+        with self._lock:
+            ready = self._ready[key]
+            opening = ready.popleft() if ready else None
+        self.refill(key, generate)
+        if opening is None:
+            opening = generate()
+        return opening
+
+    def refill(self, key, generate):
+        """Schedule background generation until `key` has `size` openings ready or in flight."""
+        with self._lock:
+            missing = self.size - len(self._ready[key]) - self._pending[key]
+            if missing <= 0:
+                return
+            self._pending[key] += missing
+        for _ in range(missing):
+            self._executor.submit(self._fill_one, key, generate)
+
+    def ready_count(self, key):
+        with self._lock:
+            return len(self._ready[key])
+
+    def _fill_one(self, key, generate):
+        try:
+            opening = generate()
+        except Exception:
+            logger.warning("Opening pre-generation failed for %s", key, exc_info=True)
+            opening = None
+        with self._lock:
+            self._pending[key] -= 1
+            if opening:
+                self._ready[key].append(opening)
+
+
+@st.cache_resource(show_spinner=False)
+def get_opening_pool():
+    """Process-wide opening pool; size is set by the OPENING_POOL_SIZE secret."""
+    return OpeningPool(size=setting("OPENING_POOL_SIZE", DEFAULT_POOL_SIZE))
@@ -0,0 +1,13 @@
+"""Declarative persona definitions, one module per bot.
+
+Adding a bot means adding a module here with a `PERSONA` and listing it below;
+the conversation logic is shared in `reverse_tutor.bots`.
+"""
+from reverse_tutor.personas import ben, boris, celeste, dan, denethor, nick
+
+PERSONAS = {p.key: p for p in (celeste.PERSONA, ben.PERSONA, boris.PERSONA,
+                               denethor.PERSONA, nick.PERSONA, dan.PERSONA)}
+
+
+def get_persona(key):
+    return PERSONAS[key]
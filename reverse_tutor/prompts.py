@@ -0,0 +1,40 @@
+"""Cache-friendly system prompt layout.
+
+The provider caches prompt prefixes, but only reuses a cached prefix when the
+leading tokens are byte-identical to an earlier request. Prompts that weave a
+scenario or a hint count into the middle of the persona text defeat this, since
+every session then starts differently.
+
+`PromptLayout` keeps the large static persona/rubric text as the first system
+message, identical for every session, and appends per-session context
+(scenario, hint limits) as a second system message. Per-turn control messages
+(history summary, hint requests) are appended after both by the callers.
+"""
+
+
+class PromptLayout:
+    def __init__(self, static, context=""):
+        self.static = static.strip()
+        self.context = context.strip()
+
+    @property
+    def text(self):
+        """Flattened prompt, for token counting and exports."""
+        return f"{self.static}\n\n{self.context}" if self.context else self.static
+
+    def messages(self):
+        msgs = [{"role": "system", "content": self.static}]
+        if self.context:
+            msgs.append({"role": "system", "content": self.context})
+        return msgs
+
+
+def system_messages(prompt):
+    """Leading system messages for `prompt`, which may be a PromptLayout or a plain string."""
+    if isinstance(prompt, PromptLayout):
+        return prompt.messages()
+    return [{"role": "system", "content": prompt}]
+
+
+def prompt_text(prompt):
+    return prompt.text if isinstance(prompt, PromptLayout) else prompt
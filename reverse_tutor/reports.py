@@ -0,0 +1,204 @@
+"""HTML session reports.
+
+Celeste, Ben and Boris each had a `build_html_export` that rebuilt the whole
+report document with f-strings on every click, stylesheet included (and, for
+Ben, a Google Fonts `@import` the lab network cannot reach). The documents now
+live in `reverse_tutor/report_templates/<persona>.html`, one file per persona,
+split into blocks:
+
+    <!-- block page -->         the document, with $now, $model, $messages, $scores, ...
+    <!-- block assistant -->    one bot reply ($content)
+    <!-- block student -->      one student message ($content)
+    <!-- block hint -->         one hint ($number, $content)
+    <!-- block score_row -->    one rubric line ($category, $score, $width)
+    <!-- block scores -->       the score card ($rows, $total, $feedback)
+    <!-- block convinced -->    status tag text once scored, and
+    <!-- block unconvinced -->  before
+
+Each block is a `string.Template` compiled once per process into its literal
+runs and field slots (`CompiledTemplate`), with the page's CSS minified at that
+point, so a report is one join of pre-rendered text and the per-message rows.
+
+Instructors can render a report for every stored session at once:
+
+    python -m reverse_tutor.reports --persona ben --since 2026-10-01 -o reports/
+
+which takes the same session filters as `reverse_tutor.export`.
+"""
+import argparse
+import html
+import re
+import sqlite3
+import string
+import sys
+from datetime import date, datetime
+from functools import lru_cache
+from pathlib import Path
+
+from reverse_tutor.assets import minify
+from reverse_tutor.bots import strip_grade_block
+from reverse_tutor.export import connect, iter_sessions, session_scores
+from reverse_tutor.grading import SCORE_MAX, score_labels
+from reverse_tutor.personas import PERSONAS, get_persona
+from reverse_tutor.personas.boris import SCENARIOS
+from reverse_tutor.store import DEFAULT_DB_PATH
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "report_templates"
+DATE_FORMAT = "%B %d, %Y – %H:%M"
+
+_BLOCK = re.compile(r"^<!-- block (\w+) -->\n", re.MULTILINE)
+_STYLE = re.compile(r"(<style>)(.*?)(</style>)", re.DOTALL)
+
+
+def _scenario_fields(scenario_key):
+    sc = SCENARIOS.get(scenario_key, {})
+    return {"scenario": scenario_key, "drug": sc.get("drug", ""), "route": sc.get("route", ""),
+            "target": sc.get("target", "")}
+
+
+# Page fields that depend on the session's context, per persona.
+CONTEXT_FIELDS = {"boris": _scenario_fields}
+
+
+class CompiledTemplate:
+    """A `string.Template` split once into literal text and field slots."""
+
+    def __init__(self, text):
+        self.parts = []
+        self.slots = []         # (index in parts, field name)
+        literal, pos = "", 0
+        for match in string.Template.pattern.finditer(text):
+            literal += text[pos:match.start()]
+            pos = match.end()
+            if match.group("escaped") is not None:
+                literal += "$"
+                continue
+            name = match.group("named") or match.group("braced")
+            if name is None:
+                raise ValueError(f"invalid placeholder at {text[match.start():match.start() + 20]!r}")
+            self.parts.append(literal)
+            self.slots.append((len(self.parts), name))
+            self.parts.append("")
+            literal = ""
+        self.parts.append(literal + text[pos:])
+
+    def render(self, **fields):
+        parts = self.parts.copy()
+        for index, name in self.slots:
+            parts[index] = str(fields[name])
+        return "".join(parts)
+
+
+class ReportTemplate:
+    """One persona's report, compiled from its template file."""
+
+    def __init__(self, persona):
+        self.persona = persona
+        text = (TEMPLATES_DIR / f"{persona.key}.html").read_text(encoding="utf-8")
+        pieces = _BLOCK.split(text)
+        blocks = {name: body.strip() for name, body in zip(pieces[1::2], pieces[2::2])}
+        blocks["page"] = _STYLE.sub(lambda m: m.group(1) + minify(m.group(2)) + m.group(3), blocks["page"])
+        self.page = CompiledTemplate(blocks.pop("page"))
+        self.status = {True: blocks.pop("convinced"), False: blocks.pop("unconvinced")}
+        self.blocks = {name: CompiledTemplate(body) for name, body in blocks.items()}
+
+    def _message(self, message):
+        content = html.escape(strip_grade_block(message["content"]), quote=False).replace("\n", "<br>")
+        if message.get("is_hint"):
+            return self.blocks["hint"].render(number=message.get("hint_num", ""), content=content)
+        block = "assistant" if message["role"] == "assistant" else "student"
+        return self.blocks[block].render(content=content)
+
+    def _scores(self, scores):
+        if not scores:
+            return ""
+        labels = {k: html.escape(str(v)) for k, v in score_labels(scores).items()}
+        rows = "".join(
+            self.blocks["score_row"].render(
+                category=cat, score=labels.get(cat, "—"), width=scores.get(cat, 0) * 100 // SCORE_MAX,
+            )
+            for cat in self.persona.grade_categories
+        )
+        return self.blocks["scores"].render(rows=rows, total=labels.get("Total", "—"),
+                                            feedback=labels.get("Feedback", ""))
+
+    def render(self, messages, scores, model, hints_used, conviction=None, context=None, when=None):
+        """The report for a session's display messages (`Transcript.display_messages()`)."""
+        fields = {"conviction": conviction if conviction is not None else "—"}
+        fields.update(CONTEXT_FIELDS[self.persona.key](context) if self.persona.key in CONTEXT_FIELDS else {})
+        fields = {name: html.escape(str(value)) for name, value in fields.items()}
+        return self.page.render(
+            now=(when or datetime.now()).strftime(DATE_FORMAT),
+            model=html.escape(model),
+            hints_used=hints_used,
+            status=self.status[bool(scores)],
+            messages="".join(self._message(m) for m in messages),
+            scores=self._scores(scores),
+            **fields,
+        )
+
+
+@lru_cache(maxsize=None)
+def get_report(key):
+    return ReportTemplate(get_persona(key))
+
+
+def render_report(persona, messages, scores, model, hints_used, **kwargs):
+    """The HTML report for one session of `persona` (see `ReportTemplate.render`)."""
+    return get_report(persona.key).render(messages, scores, model, hints_used, **kwargs)
+
+
+# ---- batch rendering ----
+
+def has_report(key):
+    return (TEMPLATES_DIR / f"{key}.html").is_file()
+
+
+def render_record(record):
+    """The report for one session record from `reverse_tutor.export.iter_sessions`."""
+    persona = get_persona(record["persona"])
+    return get_report(persona.key).render(
+        persona.display_messages(record["conversation"]), session_scores(record), record["model"],
+        record["hints_used"], conviction=record["conviction"], context=record["context"],
+        when=record["updated"].astimezone(),
+    )
+
+
+def render_batch(records, out_dir):
+    """Write one report per session record into `out_dir`; returns the number written."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for record in records:
+        if not has_report(record["persona"]):
+            continue
+        stamp = record["created"].astimezone().strftime("%Y%m%d_%H%M")
+        path = out_dir / f"{record['persona']}_session_{stamp}_{record['session_id']}.html"
+        path.write_text(render_record(record), encoding="utf-8")
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the HTML report of every stored session.")
+    parser.add_argument("-o", "--output", default="reports", help="directory for the reports")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="session database (SESSION_DB_PATH)")
+    parser.add_argument("--persona", choices=sorted(k for k in PERSONAS if has_report(k)),
+                        help="default: every persona with a report template")
+    parser.add_argument("--since", type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    parser.add_argument("--until", type=date.fromisoformat, help="last day, YYYY-MM-DD (inclusive)")
+    args = parser.parse_args(argv)
+
+    try:
+        conn = connect(args.db)
+        try:
+            count = render_batch(iter_sessions(conn, args.persona, args.since, args.until), args.output)
+        finally:
+            conn.close()
+    except (OSError, sqlite3.Error) as e:
+        parser.error(str(e))
+    print(f"Wrote {count} reports to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
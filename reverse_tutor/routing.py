@@ -0,0 +1,67 @@
+"""Model cascade: a fast model for in-character banter, the strong model when a turn may decide the session.
+
+Most turns are short pushback that a small model handles well. The turns that
+matter for grading quality are the one where the bot concedes and writes the
+grade block, so `ModelRouter` sends ordinary turns and hints to `fast_model`
+and escalates to the session's selected model once the bot's escalation rule
+says a concession may be near. After the bot has conceded, the follow-up
+discussion drops back to the fast model.
+"""
+import re
+
+FAST_MODEL = "gpt-4o-mini"
+_STOPWORDS = {"about", "after", "every", "their", "there", "these", "which", "would"}
+
+
+class ModelRouter:
+    def __init__(self, strong_model, fast_model=FAST_MODEL, escalate=None):
+        self.strong_model = strong_model
+        self.fast_model = fast_model
+        self.escalate = escalate   # callable(user_message) -> bool
+
+    @property
+    def enabled(self):
+        return self.escalate is not None and bool(self.fast_model) and self.fast_model != self.strong_model
+
+    def pick(self, user_message, is_hint_request=False, conceded=False):
+        if not self.enabled:
+            return self.strong_model
+        if is_hint_request or conceded:
+            return self.fast_model
+        if self.escalate is not None and self.escalate(user_message):
+            return self.strong_model
+        return self.fast_model
+
+
+class KeywordEscalation:
+    """Escalate once the student's messages have touched at least `min_groups` concession topics.
+
+    Each group is a list of keywords; coverage accumulates across turns, so once
+    the student is close to the concession trigger every later turn escalates.
+    """
+
+    def __init__(self, groups, min_groups):
+        self.patterns = [re.compile("|".join(re.escape(k.lower()) for k in group)) for group in groups]
+        self.min_groups = min_groups
+        self.covered = set()
+
+    def __call__(self, user_message):
+        text = user_message.lower()
+        for i, pattern in enumerate(self.patterns):
+            if pattern.search(text):
+                self.covered.add(i)
+        return len(self.covered) >= self.min_groups
+
+
+def keyword_groups(phrases, min_length=5, stopwords=()):
+    """Derive one keyword group per phrase from its longer words (e.g. from a scenario's barrier list).
+
+    `stopwords` are the persona's own words too common in its debates to mark a topic.
+    """
+    skip = _STOPWORDS.union(stopwords)
+    groups = []
+    for phrase in phrases:
+        words = {w for w in re.findall(r"[a-zα-ω]+", phrase.lower())
+                 if len(w) >= min_length and w not in skip}
+        groups.append(sorted(words) or [phrase.lower()])
+    return groups
@@ -0,0 +1,208 @@
+"""Disk-backed session store.
+
+A student's transcript used to live only in `st.session_state`, so it was
+lost on disconnect and grew without bound in long debates. Every history message is
+now appended once to a SQLite database (WAL mode, so the many script threads
+and processes can read while one writes), together with a small JSON snapshot
+of the bot's state: conceded, hints, conviction, running summary and token
+usage.
+
+In memory a bot keeps only the turns its compactor has not folded into the
+summary, plus the most recent ones for the chat panel. The session id goes into
+the page URL (`?sid=...`), so a student who reloads the page resumes where
+they left off instead of getting a fresh opening statement. Bots that have
+been idle for longer than SESSION_IDLE_TTL seconds drop their in-memory
+history; it is reloaded from disk on their next turn.
+
+Settings in `.streamlit/secrets.toml`:
+
+    SESSION_DB_PATH = "sessions.db"
+    SESSION_IDLE_TTL = 1800
+"""
+import json
+import secrets
+import sqlite3
+import threading
+import time
+import weakref
+
+import streamlit as st
+
+from reverse_tutor.bots import PersonaBot
+from reverse_tutor.clients import setting
+
+DEFAULT_DB_PATH = "sessions.db"
+DEFAULT_IDLE_TTL = 1800.0   # seconds without a turn before a bot's history is evicted from memory
+SWEEP_INTERVAL = 60.0       # minimum seconds between idle sweeps
+
+_URL_SESSION_KEY = "_url_session"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id       TEXT PRIMARY KEY,
+    persona  TEXT NOT NULL,
+    context  TEXT,
+    model    TEXT NOT NULL,
+    state    TEXT NOT NULL DEFAULT '{}',
+    created  REAL NOT NULL,
+    updated  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    seq        INTEGER NOT NULL,
+    role       TEXT NOT NULL,
+    content    TEXT NOT NULL,
+    created    REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated);
+"""
+
+
+class SessionStore:
+    """Sessions and their history messages in one SQLite file, shared by every script thread."""
+
+    def __init__(self, path=DEFAULT_DB_PATH, idle_ttl=DEFAULT_IDLE_TTL):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._live = {}          # session id -> (bot, last activity)
+        self._bots = weakref.WeakValueDictionary()  # session id -> every bot still referenced, even if evicted
+        self._last_sweep = time.monotonic()
+
+    # ---- sessions ----
+
+    def create(self, persona, model, context=None):
+        session_id = secrets.token_urlsafe(12)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (id, persona, context, model, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, persona, context, model, now, now),
+            )
+        return session_id
+
+    def session(self, session_id):
+        """The session row as a dict (with `state` decoded), or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        session = dict(row)
+        session["state"] = json.loads(session["state"])
+        return session
+
+    def save_state(self, session_id, state, model=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET state = ?, model = COALESCE(?, model), updated = ? WHERE id = ?",
+                (json.dumps(state), model, time.time(), session_id),
+            )
+
+    # ---- history messages ----
+
+    def append(self, session_id, seq, role, content):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO turns (session_id, seq, role, content, created) VALUES (?, ?, ?, ?, ?)",
+                (session_id, seq, role, content, time.time()),
+            )
+
+    def turns(self, session_id, start=0, end=None):
+        """History messages with sequence numbers in [start, end), oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, role, content FROM turns WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (session_id, start, float("inf") if end is None else end),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    # ---- in-memory footprint ----
+
+    def touch(self, bot):
+        """Mark `bot` active now, and evict bots idle for longer than `idle_ttl`."""
+        now = time.monotonic()
+        idle = []
+        with self._lock:
+            self._live[bot.session_id] = (bot, now)
+            self._bots[bot.session_id] = bot
+            if now - self._last_sweep >= SWEEP_INTERVAL:
+                self._last_sweep = now
+                idle = [sid for sid, (_, seen) in self._live.items() if now - seen > self.idle_ttl]
+                idle = [self._live.pop(sid)[0] for sid in idle]
+        for idle_bot in idle:
+            idle_bot.unload()
+
+    def live_bot(self, session_id):
+        """The bot already serving `session_id` in this process, or None."""
+        with self._lock:
+            return self._bots.get(session_id)
+
+
+@st.cache_resource(show_spinner=False)
+def _build_store(path, idle_ttl):
+    return SessionStore(path, idle_ttl)
+
+
+def get_session_store():
+    """Process-wide store; SESSION_DB_PATH and SESSION_IDLE_TTL come from secrets."""
+    return _build_store(
+        setting("SESSION_DB_PATH", DEFAULT_DB_PATH),
+        setting("SESSION_IDLE_TTL", DEFAULT_IDLE_TTL),
+    )
+
+
+def _url_session(persona):
+    # Looked up once per browser session: the pickers' defaults must not change under the student.
+    if _URL_SESSION_KEY not in st.session_state:
+        session_id = st.query_params.get("sid")
+        session = get_session_store().session(session_id) if session_id else None
+        st.session_state[_URL_SESSION_KEY] = (
+            {"model": session["model"], "context": session["context"]}
+            if session is not None and session["persona"] == persona.key else None
+        )
+    return st.session_state[_URL_SESSION_KEY]
+
+
+def resume_index(persona, field, options):
+    """Index in `options` of the `?sid=` session's "model" or "context", for a picker's default; else 0.
+
+    Apps draw their model (and scenario) pickers with it before calling
+    `resume_session`, so a reload comes back to the choices the session was
+    started with instead of the first option, which would start a new session.
+    """
+    session = _url_session(persona)
+    options = list(options)
+    value = session[field] if session is not None else None
+    return options.index(value) if value in options else 0
+
+
+def start_session(persona, model, context=None):
+    """A new persisted bot; its id goes into the page URL so a reload can resume it."""
+    bot = PersonaBot(persona, model, context, store=get_session_store())
+    st.query_params["sid"] = bot.session_id
+    return bot
+
+
+def resume_session(persona, model, context=None):
+    """The bot for the `?sid=` in the URL, if it belongs to this persona and context; otherwise None.
+
+    The bot keeps the model the session was stored with. Apps call this once
+    when a page first loads, so it also warms the opening pool for the next
+    Reset or new session.
+    """
+    persona.warm_openings(model, (context,))
+    session_id = st.query_params.get("sid")
+    if not session_id:
+        return None
+    store = get_session_store()
+    # A second tab on the same session shares the first tab's bot; two bots would both write the same turns.
+    bot = store.live_bot(session_id)
+    if bot is not None and bot.persona is persona and bot.context == context:
+        return bot
+    return PersonaBot.resume(persona, store, session_id, context)
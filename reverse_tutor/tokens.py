@@ -0,0 +1,154 @@
+"""Per-conversation token accounting.
+
+`TokenizedHistory` is the base class of `reverse_tutor.transcript.Transcript`:
+each message is tokenised once when it is appended and a running total is kept,
+so the size of the next request is known without re-tokenising the whole
+transcript. `TokenUsage` accumulates the prompt/completion counts the API
+reports back for a session, including how many prompt tokens were served from
+the provider's prefix cache. Process-wide totals per persona are the
+`tutor_tokens_total` counters in `reverse_tutor.metrics`.
+
+tiktoken is used when it is installed and its encodings are available; otherwise
+counts fall back to a ~4 characters per token estimate.
+"""
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+CONTEXT_LIMITS = {
+    "gpt-4o":      128_000,
+    "gpt-4o-mini": 128_000,
+    "gpt-5-mini":  400_000,
+}
+DEFAULT_CONTEXT_LIMIT = 128_000
+CONTEXT_WARNING_RATIO = 0.8   # warn once the next payload passes this share of the limit
+MESSAGE_OVERHEAD = 4          # role and separator tokens added per chat message
+
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    if tiktoken is None:
+        return None
+    # Encodings are downloaded on first use; fall back to the estimate when offline.
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass                # a model this tiktoken does not know yet
+    except Exception:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text, model="gpt-4o"):
+    enc = _encoding(model)
+    if enc is None:
+        return len(text) // 4 + 1
+    return len(enc.encode(text))
+
+
+@lru_cache(maxsize=64)
+def count_prompt_tokens(text, model="gpt-4o"):
+    """Token count for long, rarely-changing text such as system prompts, cached by content."""
+    return count_tokens(text, model) + MESSAGE_OVERHEAD
+
+
+def context_limit(model):
+    return CONTEXT_LIMITS.get(model, DEFAULT_CONTEXT_LIMIT)
+
+
+def near_context_limit(payload_tokens, model):
+    return payload_tokens >= CONTEXT_WARNING_RATIO * context_limit(model)
+
+
+class TokenizedHistory(list):
+    """Append-only message list that counts each message's tokens exactly once.
+
+    `Transcript` builds on it and counts only the turns that are sent.
+    """
+
+    def __init__(self, model="gpt-4o", messages=()):
+        super().__init__()
+        self.model = model
+        self._prefix = [0]   # _prefix[i] = tokens in the first i messages
+        self.extend(messages)
+
+    @property
+    def total_tokens(self):
+        return self._prefix[-1]
+
+    def tokens_between(self, start, end=None):
+        """Tokens in messages[start:end], in O(1)."""
+        end = len(self) if end is None else end
+        return self._prefix[end] - self._prefix[start]
+
+    def _message_tokens(self, message):
+        return count_tokens(message["content"], self.model) + MESSAGE_OVERHEAD
+
+    def append(self, message):
+        super().append(message)
+        self._prefix.append(self._prefix[-1] + self._message_tokens(message))
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def __iadd__(self, messages):
+        self.extend(messages)
+        return self
+
+    def clear(self):
+        super().clear()
+        self._prefix = [0]
+
+    def drop_prefix(self, count):
+        """Forget the first `count` messages, e.g. once they are summarised and stored elsewhere."""
+        base = self._prefix[count]
+        del self[:count]
+        self._prefix = [tokens - base for tokens in self._prefix[count:]]
+
+    def __reduce__(self):
+        return (type(self), (self.model, list(self)))
+
+
+_USAGE_FIELDS = ("prompt_tokens", "cached_prompt_tokens", "completion_tokens", "requests")
+
+
+class TokenUsage:
+    """Running prompt/completion token totals reported by the API for one session."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+        self.requests = 0
+
+    @property
+    def cache_hit_ratio(self):
+        return self.cached_prompt_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def record(self, usage):
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        delta = {
+            "prompt_tokens": usage.prompt_tokens or 0,
+            "cached_prompt_tokens": getattr(details, "cached_tokens", None) or 0,
+            "completion_tokens": usage.completion_tokens or 0,
+            "requests": 1,
+        }
+        for field, value in delta.items():
+            setattr(self, field, getattr(self, field) + value)
+
+    def snapshot(self):
+        return {field: getattr(self, field) for field in _USAGE_FIELDS}
+
+    def restore(self, snapshot):
+        """Continue the totals of a resumed session."""
+        for field in _USAGE_FIELDS:
+            setattr(self, field, snapshot.get(field, 0))
@@ -0,0 +1,99 @@
+"""One transcript per session.
+
+Every turn used to be appended twice: to `st.session_state.messages` for the
+chat panel and to `bot.conversation_history` for the API, and Celeste kept the
+conviction tag in one copy and not in the other. A `Transcript` now holds each
+message once, as a slotted `Turn`, and both consumers read views of it:
+
+- `api_messages()` is the history part of the request payload. Each turn's
+  `{"role", "content"}` dict is built on first use and cached on the turn, so
+  assembling a request no longer rebuilds a dict per message every turn.
+- `display()` is the chat panel. A reply's display text (for example without
+  the conviction tag or the grade block) is worked out once, when the turn is
+  added, and apps may cache their rendered markup for a turn in `Turn.html`.
+
+Turns that were never sent, such as a failed message and its error, are shown
+but left out of the API history. Hidden turns, such as the opening trigger and
+hint requests, are sent but not shown.
+"""
+from reverse_tutor.tokens import MESSAGE_OVERHEAD, TokenizedHistory, count_tokens
+
+
+class Turn:
+    """One message. `sent` turns are part of the API history; `shown` turns appear in the chat panel."""
+    __slots__ = ("role", "content", "sent", "shown", "hint", "seq", "html", "_text", "_message")
+
+    def __init__(self, role, content, sent=True, shown=True, hint=None, seq=None):
+        self.role = role
+        self.content = content      # exactly as sent to or received from the API
+        self.sent = sent
+        self.shown = shown
+        self.hint = hint            # hint number for hint replies, else None
+        self.seq = seq              # position in the session store, for sent turns
+        self.html = None            # the app's rendered markup for this turn, once drawn
+        self._text = None
+        self._message = None
+
+    @property
+    def is_hint(self):
+        return self.hint is not None
+
+    @property
+    def text(self):
+        return self.content if self._text is None else self._text
+
+    @property
+    def message(self):
+        if self._message is None:
+            self._message = {"role": self.role, "content": self.content}
+        return self._message
+
+    def as_dict(self):
+        """The display message in the apps' export format."""
+        message = {"role": self.role, "content": self.text}
+        if self.is_hint:
+            message.update(is_hint=True, hint_num=self.hint)
+        return message
+
+
+def make_turn(role, content, clean=None, **flags):
+    """A `Turn`, with its display text worked out by `clean` if it is a reply."""
+    turn = Turn(role, content, **flags)
+    if clean is not None and role == "assistant":
+        turn._text = clean(content)
+    return turn
+
+
+class Transcript(TokenizedHistory):
+    """A session's turns, with token counts for the sent ones.
+
+    `clean` maps a reply's raw content to what the chat panel shows.
+    """
+
+    def __init__(self, model="gpt-4o", turns=(), clean=None):
+        self.clean = clean
+        super().__init__(model, turns)
+
+    def _message_tokens(self, turn):
+        return count_tokens(turn.content, self.model) + MESSAGE_OVERHEAD if turn.sent else 0
+
+    def add(self, role, content, **flags):
+        turn = make_turn(role, content, self.clean, **flags)
+        self.append(turn)
+        return turn
+
+    def api_messages(self, start=0, end=None):
+        return [turn.message for turn in self[start:end] if turn.sent]
+
+    def display(self):
+        return [turn for turn in self if turn.shown]
+
+    def display_messages(self):
+        """The chat panel as plain dicts, for exports."""
+        return [turn.as_dict() for turn in self.display()]
+
+    def user_turns(self):
+        return sum(1 for turn in self if turn.shown and turn.role == "user")
+
+    def __reduce__(self):
+        return (type(self), (self.model, list(self), self.clean))
@@ -0,0 +1,67 @@
+"""Shared fixtures: secrets outside a Streamlit run and a stand-in for the completion engine."""
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+import streamlit as st
+
+from reverse_tutor import bots
+from reverse_tutor.bots import HintPolicy, Persona
+
+
+def completion(text):
+    """A chat completion as the SDK returns it, without usage."""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=None)
+
+
+class FakeEngine:
+    """Answers every request at once with the next of `replies` (or "OK.") and keeps the requests."""
+
+    def __init__(self, replies=()):
+        self.replies = list(replies)
+        self.requests = []
+
+    def submit(self, persona=None, **params):
+        self.requests.append(params)
+        future = Future()
+        future.set_result(completion(self.replies.pop(0) if self.replies else "OK."))
+        return future
+
+    def complete(self, on_wait=None, persona=None, **params):
+        return self.submit(persona, **params).result()
+
+    def stream(self, on_wait=None, persona=None, **params):
+        """The reply in a few chunks, like a streamed completion."""
+        text = self.complete(on_wait, persona, **params).choices[0].message.content
+        for start in range(0, len(text), 5):
+            delta = SimpleNamespace(content=text[start:start + 5])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+    def busy(self):
+        return False
+
+
+PERSONA = Persona(
+    key="test",
+    name="Test",
+    prompt="You are a stubborn character in a debate.",
+    opening_trigger="Begin the debate.",
+    concession=lambda response: False,
+    hints=HintPolicy("Give hint #{number}."),
+)
+
+
+@pytest.fixture(autouse=True)
+def secrets(monkeypatch):
+    """Empty secrets, so settings fall back to their defaults; hint prefetching is off."""
+    monkeypatch.setattr(st.secrets, "_secrets", {"HINT_PREFETCH": False})
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = FakeEngine()
+    monkeypatch.setattr(bots, "get_completion_engine", lambda: engine)
+    monkeypatch.setattr(bots, "get_opening_pool", lambda: SimpleNamespace(
+        take=lambda key, generate: "I will not be moved.",
+    ))
+    return engine
@@ -0,0 +1,84 @@
+import pytest
+
+from conftest import PERSONA
+from reverse_tutor import metrics
+from reverse_tutor.bots import ConvictionStreamFilter, PersonaBot, parse_conviction, parse_grade, strip_grade_block
+
+
+def _stream(chunks):
+    stream = ConvictionStreamFilter()
+    shown = [stream.feed(chunk) for chunk in chunks]
+    return shown, stream.flush(), stream
+
+
+def test_plain_text_passes_through():
+    shown, rest, stream = _stream(["Diffusion ", "is too slow."])
+    assert shown == ["Diffusion ", "is too slow."]
+    assert rest == ""
+    assert stream.raw == "Diffusion is too slow."
+
+
+@pytest.mark.parametrize("chunks", [
+    ["Not convinced. [CONVICTION:80]"],
+    ["Not convinced. [CONV", "ICTION:80]"],
+    ["Not convinced. [", "CONVICTION:", "8", "0]"],
+])
+def test_conviction_tag_is_held_back_across_chunks(chunks):
+    shown, rest, stream = _stream(chunks)
+    assert "".join(shown) + rest == "Not convinced. "
+    assert stream.raw == "".join(chunks)
+
+
+def test_text_after_the_tag_is_shown():
+    shown, rest, _ = _stream(["Hmm. [CONVICTION:6", "5]\nStill, no."])
+    assert "".join(shown) + rest == "Hmm. \nStill, no."
+
+
+def test_grade_block_is_never_shown():
+    shown, rest, stream = _stream(["Fine, you win.\n---GR", "ADE---\nAccuracy: 4/5\n", "Total: 18/25"])
+    assert "".join(shown) + rest == "Fine, you win.\n"
+    assert stream.raw.endswith("Total: 18/25")
+
+
+def test_flush_releases_a_partial_marker():
+    shown, rest, _ = _stream(["The answer is in [", "Smith 2020"])
+    assert shown == ["The answer is in ", "[Smith 2020"]
+
+    shown, rest, _ = _stream(["Price: [5"])
+    assert shown == ["Price: [5"]
+
+    shown, rest, _ = _stream(["See [CON"])
+    assert (shown, rest) == (["See "], "[CON")
+
+
+def test_parse_conviction():
+    assert parse_conviction("No.\n[CONVICTION:72]") == ("No.", 72)
+    assert parse_conviction("No.") == ("No.", None)
+
+
+def test_parse_grade():
+    reply = "I concede.\n---GRADE---\nAccuracy: 4/5\nReasoning: 3 / 5\nTotal: 7/10\nFeedback: Good.\n---END GRADE---"
+    assert strip_grade_block(reply) == "I concede."
+    assert parse_grade(reply, ["Accuracy", "Reasoning"]) == {
+        "Accuracy": 4, "Reasoning": 3, "Total": 7, "Feedback": "Good.",
+    }
+    assert parse_grade("I concede.", ["Accuracy"]) is None
+
+
+def _turns_timed():
+    return sum(row["count"] for row in metrics.REGISTRY.stages() if row["persona"] == "test" and row["stage"] == "turn")
+
+
+def test_streamed_turns_are_timed_whether_or_not_they_fail(engine):
+    bot = PersonaBot(PERSONA, "gpt-4o")
+    engine.replies.append("No. [CONVICTION:90]")
+    before = _turns_timed()
+
+    assert "".join(bot.stream_response("Consider the data.")) == "No. "
+    assert bot.last_raw_response == "No. [CONVICTION:90]"
+
+    def fail(**params):
+        raise RuntimeError("down")
+    engine.stream = fail
+    assert "".join(bot.stream_response("Hello?")).startswith("❌ API Error")
+    assert _turns_timed() == before + 2
@@ -0,0 +1,19 @@
+import pytest
+import streamlit as st
+
+from reverse_tutor.clients import setting
+
+
+@pytest.mark.parametrize("value, expected", [
+    (False, False), (True, True), ("false", False), ("Off", False), ("0", False), ("true", True), ("1", True),
+])
+def test_boolean_settings(monkeypatch, value, expected):
+    monkeypatch.setattr(st.secrets, "_secrets", {"REMOTE_FONTS": value})
+    assert setting("REMOTE_FONTS", not expected) is expected
+
+
+def test_settings_take_the_default_type(monkeypatch):
+    monkeypatch.setattr(st.secrets, "_secrets", {"SESSION_IDLE_TTL": "60", "OPENING_POOL_SIZE": 8.0})
+    assert setting("SESSION_IDLE_TTL", 1800.0) == 60.0
+    assert setting("OPENING_POOL_SIZE", 4) == 8
+    assert setting("METRICS_PORT", 0) == 0
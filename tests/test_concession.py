@@ -0,0 +1,78 @@
+import pytest
+
+from reverse_tutor.concession import (
+    LABELS_PATH, ConcessionClassifier, _persona_classifier, _read_labels, concession_line, evaluate,
+)
+
+LINE = "I concede — you've convinced me. Diffusion can release the full dose reliably."
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return ConcessionClassifier(LINE)
+
+
+def test_concession_line_is_read_from_the_prompt():
+    prompt = f'When you concede, say:\n"{LINE}"\nThen grade the student.'
+    assert concession_line(prompt) == LINE
+    assert ConcessionClassifier.from_prompt(prompt).line == LINE
+    assert concession_line("No line here.") == ""
+
+
+@pytest.mark.parametrize("reply", [
+    LINE,
+    "I stand corrected. Diffusion really can deliver the whole dose.",
+    "Very well, I was wrong about erosion.",
+    "You’ve convinced me, I suppose.",
+])
+def test_concessions(classifier, reply):
+    assert classifier(reply)
+
+
+@pytest.mark.parametrize("reply", [
+    "Good point, but diffusion still tails off long before the dose is out.",
+    "You're correct that the gradient drives it. However, erosion is the only reliable route.",
+    "I will never concede that diffusion is enough.",
+    "I'm not convinced. Show me the release curve.",
+    "I understand your argument, yet I remain unmoved.",
+])
+def test_polite_disagreement_is_not_a_concession(classifier, reply):
+    assert not classifier(reply)
+
+
+def test_features_count_cues_and_contrast(classifier):
+    features = classifier.features("Good point, but you are still wrong.")
+    assert features["weak"] == 1
+    assert features["contrast"] == 1
+    assert features["strong"] == 0
+
+    features = classifier.features("I'm not saying I was wrong.")
+    assert features["negated"] == 1
+    assert features["strong"] == 0
+
+
+def test_grade_block_counts_as_a_concession(classifier):
+    reply = "Well argued.\n---GRADE---\nAccuracy: 4/5"
+    assert classifier.features(reply)["rubric"] == 1
+    assert classifier(reply)
+
+
+def test_denethor_paraphrase():
+    classifier = _persona_classifier("denethor")
+    assert classifier("*A heavy sigh.* Perhaps my reliance on the old ways has blinded me. I see your point.")
+    assert not classifier("The old laws have served Gondor for an age. Your patchy proteins change nothing.")
+
+
+def test_bundled_labels():
+    records = _read_labels(LABELS_PATH)
+    classifiers = {}
+
+    def detect(record):
+        key = record["persona"]
+        if key not in classifiers:
+            classifiers[key] = _persona_classifier(key)
+        return classifiers[key](record["text"])
+
+    scores = evaluate(records, {"classifier": detect})["classifier"]
+    assert scores["precision"] == 1.0
+    assert scores["recall"] >= 0.9
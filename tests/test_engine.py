@@ -0,0 +1,107 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from reverse_tutor.engine import RateLimitGate, _parse_duration, _retry_after
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("1s", 1.0), ("6m0s", 360.0), ("250ms", 0.25), ("1h2m3.5s", 3723.5), ("", 0.0), (None, 0.0),
+])
+def test_parse_duration(value, seconds):
+    assert _parse_duration(value) == pytest.approx(seconds)
+
+
+def test_retry_after_seconds_and_dates():
+    assert _retry_after("3") == 3.0
+    assert _retry_after(None) == 0.0
+    assert _retry_after("soon") == 0.0
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert _retry_after(later) == pytest.approx(30.0, abs=2.0)
+    assert _retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_no_headers_do_not_hold():
+    gate = RateLimitGate()
+    gate.update({})
+    assert not gate.holding()
+    assert gate.remaining_tokens is None
+
+
+def test_out_of_requests_holds_until_reset():
+    gate = RateLimitGate()
+    gate.update({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "2s"})
+    assert gate.holding()
+    assert gate.resume_at - time.monotonic() == pytest.approx(2.0, abs=0.1)
+
+
+def test_low_tokens_hold_until_token_reset():
+    gate = RateLimitGate()
+    gate.update({
+        "x-ratelimit-remaining-requests": "50",
+        "x-ratelimit-remaining-tokens": "1000",
+        "x-ratelimit-limit-tokens": "100000",
+        "x-ratelimit-reset-tokens": "6m0s",
+    })
+    assert gate.holding()
+    assert gate.resume_at - time.monotonic() == pytest.approx(360.0, abs=0.1)
+
+
+def test_plenty_left_does_not_hold():
+    gate = RateLimitGate()
+    gate.update({
+        "x-ratelimit-remaining-requests": "50",
+        "x-ratelimit-remaining-tokens": "90000",
+        "x-ratelimit-limit-tokens": "100000",
+        "x-ratelimit-reset-tokens": "6m0s",
+    })
+    assert not gate.holding()
+
+
+def test_token_limit_is_kept_when_a_response_omits_it():
+    gate = RateLimitGate()
+    gate.update({"x-ratelimit-limit-tokens": "100000"})
+    gate.update({"x-ratelimit-remaining-tokens": "10", "x-ratelimit-reset-tokens": "1s"})
+    assert gate.limit_tokens == 100000
+    assert gate.holding()
+
+
+def test_hold_never_shortens():
+    gate = RateLimitGate()
+    gate.hold(10)
+    resume_at = gate.resume_at
+    gate.hold(1)
+    assert gate.resume_at == resume_at
+
+
+def test_admit_spends_the_remaining_budget():
+    gate = RateLimitGate()
+    gate.update({"x-ratelimit-remaining-requests": "10", "x-ratelimit-remaining-tokens": "1000"})
+    asyncio.run(gate.admit(300))
+    assert (gate.remaining_requests, gate.remaining_tokens) == (9, 700)
+
+
+def test_admit_waits_out_a_hold():
+    gate = RateLimitGate()
+    gate.hold(0.1)
+    start = time.monotonic()
+    asyncio.run(gate.admit(10))
+    assert time.monotonic() - start >= 0.1
+    assert not gate.holding()
+
+
+def test_admit_waits_for_fresh_headers_when_a_request_would_not_fit(monkeypatch):
+    slept = []
+
+    async def sleep(delay):
+        slept.append(delay)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    gate = RateLimitGate()
+    gate.update({"x-ratelimit-remaining-tokens": "100"})
+    asyncio.run(gate.admit(500))
+    assert slept == [1.0]
+    assert gate.remaining_tokens is None
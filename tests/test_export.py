@@ -0,0 +1,58 @@
+import pytest
+import streamlit as st
+
+from reverse_tutor import analytics
+from reverse_tutor.bots import PersonaBot
+from reverse_tutor.export import FIELDS, connect, iter_sessions, session_scores
+from reverse_tutor.personas import get_persona
+from reverse_tutor.store import SessionStore
+
+GRADE = "Fine.\n---GRADE---\nClarity: 4/5\nEvidence: 3/5\nLogic: 5/5\nPoliteness: 4/5\nTotal: 16/20\n---END GRADE---"
+
+
+@pytest.fixture
+def db(tmp_path, engine, monkeypatch):
+    """A store with a conceded Ben session (with a hint) and one still going."""
+    monkeypatch.setattr(st.secrets, "_secrets", {"HINT_PREFETCH": False, "STRUCTURED_GRADING": False})
+    path = str(tmp_path / "sessions.db")
+    store = SessionStore(path)
+    ben = get_persona("ben")
+    conceded = PersonaBot(ben, "gpt-4o", store=store)
+    conceded.open_conversation()
+    engine.replies += ["No.", "A hint.", "Still no.", GRADE, "You're welcome."]
+    conceded.get_response("Check the failure rate.")
+    conceded.get_response("", is_hint_request=True)
+    conceded.get_response("What about the trial?")
+    conceded.get_response("And the follow-up data?")
+    conceded.get_response("Thanks!")
+    assert conceded.conceded
+    going = PersonaBot(ben, "gpt-4o", store=store)
+    going.open_conversation()
+    going.get_response("Hello.")
+    return path
+
+
+def test_sql_turn_counts_match_the_conversation(db):
+    conn = connect(db)
+    full = list(iter_sessions(conn, "ben"))
+    lean = list(iter_sessions(conn, "ben", fields=analytics.RECORD_FIELDS))
+    conn.close()
+
+    assert set(full[0]) == set(FIELDS)
+    assert "conversation" not in lean[0]
+    assert [analytics._student_turns(r) for r in lean] == [analytics._student_turns(r) for r in full] == [
+        (3, 4), (None, 1),
+    ]
+    assert [session_scores(r) for r in lean] == [session_scores(r) for r in full]
+    assert session_scores(lean[0])["Total"] == 16
+
+
+def test_store_and_archive_tables_agree(db):
+    conn = connect(db)
+    from_store = analytics.SessionTable.from_records(
+        get_persona("ben"), iter_sessions(conn, "ben", fields=analytics.RECORD_FIELDS))
+    from_archive = analytics.load_tables(iter_sessions(conn))["ben"]
+    conn.close()
+
+    assert analytics.summary(from_store) == analytics.summary(from_archive)
+    assert from_store.concession_turn.tolist() == [3, -1]
@@ -0,0 +1,125 @@
+from concurrent.futures import Future
+
+from conftest import FakeEngine
+from reverse_tutor.history import HistoryCompactor
+from reverse_tutor.transcript import Transcript
+
+
+def _exchanges(count):
+    history = []
+    for n in range(count):
+        history += [{"role": "user", "content": f"argument {n}"}, {"role": "assistant", "content": f"reply {n}"}]
+    return history
+
+
+def _compactor(engine, keep_turns=1):
+    return HistoryCompactor(engine, token_budget=0, keep_turns=keep_turns)
+
+
+def _excerpt(engine):
+    return engine.requests[-1]["messages"][1]["content"].split("NEW TRANSCRIPT EXCERPT:\n")[1].splitlines()
+
+
+def test_under_budget_sends_everything():
+    engine = FakeEngine()
+    compactor = HistoryCompactor(engine, token_budget=10_000)
+    history = _exchanges(4)
+
+    assert compactor.build_messages("system", history)[1:] == history
+    assert engine.requests == []
+
+
+def test_folds_older_exchanges_into_the_summary():
+    engine = FakeEngine(["They argued 0 and 1."])
+    compactor = _compactor(engine, keep_turns=2)
+    history = _exchanges(4)
+
+    compactor.build_messages("system", history)
+    assert _excerpt(engine) == ["USER: argument 0", "ASSISTANT: reply 0", "USER: argument 1", "ASSISTANT: reply 1"]
+
+    messages = compactor.build_messages("system", history, pinned_state=["You have not conceded yet."])
+    assert compactor.folded == 4
+    assert messages[1]["role"] == "system"
+    assert "They argued 0 and 1." in messages[1]["content"]
+    assert "- You have not conceded yet." in messages[1]["content"]
+    assert messages[2:] == history[4:]
+
+
+def test_odd_history_folds_whole_exchanges_only():
+    engine = FakeEngine()
+    compactor = _compactor(engine)
+    history = _exchanges(3) + [{"role": "user", "content": "argument 3"}]
+
+    compactor.build_messages("system", history)
+    assert _excerpt(engine)[-1] == "ASSISTANT: reply 1"
+
+
+def test_failed_hint_does_not_split_an_exchange():
+    engine = FakeEngine()
+    compactor = _compactor(engine)
+    history = Transcript()
+    history.add("user", "argument 0")
+    history.add("assistant", "reply 0")
+    history.add("assistant", "❌ API Error: hint failed", sent=False, hint=1)
+    for n in range(1, 4):
+        history.add("user", f"argument {n}")
+        history.add("assistant", f"reply {n}")
+
+    compactor.build_messages("system", history)
+    assert _excerpt(engine) == [
+        "USER: argument 0", "ASSISTANT: reply 0",
+        "USER: argument 1", "ASSISTANT: reply 1",
+        "USER: argument 2", "ASSISTANT: reply 2",
+    ]
+    compactor.build_messages("system", history)
+    assert history.api_messages(compactor.folded) == [
+        {"role": "user", "content": "argument 3"}, {"role": "assistant", "content": "reply 3"},
+    ]
+
+
+def test_failed_message_does_not_split_an_exchange():
+    engine = FakeEngine()
+    compactor = _compactor(engine)
+    history = Transcript()
+    for n in range(3):
+        history.add("user", f"argument {n}")
+        history.add("assistant", f"reply {n}")
+    history.add("user", "lost", sent=False)
+    history.add("assistant", "❌ API Error: timed out", sent=False)
+    history.add("user", "argument 3")
+    history.add("assistant", "reply 3")
+
+    compactor.build_messages("system", history)
+    assert _excerpt(engine)[-1] == "ASSISTANT: reply 2"
+
+
+def _failed(persona=None, **params):
+    future = Future()
+    future.set_exception(RuntimeError("summary failed"))
+    return future
+
+
+def test_failed_summary_keeps_sending_full_history():
+    engine = FakeEngine()
+    engine.submit = _failed
+    compactor = _compactor(engine)
+    history = _exchanges(4)
+
+    compactor.build_messages("system", history)
+    assert compactor.build_messages("system", history)[1:] == history
+    assert compactor.folded == 0
+
+
+def test_release_drops_the_folded_prefix():
+    engine = FakeEngine()
+    compactor = _compactor(engine)
+    history = Transcript()
+    for message in _exchanges(4):
+        history.add(message["role"], message["content"])
+    compactor.build_messages("system", history)
+    compactor.build_messages("system", history)
+
+    assert compactor.release(history, keep=4) == 4
+    assert compactor.folded == 2
+    assert len(history) == 4
+    assert compactor.build_messages("system", history)[2:] == history.api_messages(2)
@@ -0,0 +1,119 @@
+import gc
+import sqlite3
+
+import pytest
+
+from conftest import PERSONA
+from reverse_tutor.bots import Persona, PersonaBot
+from reverse_tutor.store import SessionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.db"))
+
+
+def test_turns_returns_range_in_order(store):
+    session_id = store.create("test", "gpt-4o")
+    for seq, role in enumerate(["user", "assistant", "user", "assistant"]):
+        store.append(session_id, seq, role, f"message {seq}")
+
+    assert [t["seq"] for t in store.turns(session_id)] == [0, 1, 2, 3]
+    assert store.turns(session_id, 1, 3) == [
+        {"seq": 1, "role": "assistant", "content": "message 1"},
+        {"seq": 2, "role": "user", "content": "message 2"},
+    ]
+    assert store.turns(session_id, 4) == []
+
+
+def test_append_rejects_a_taken_position(store):
+    session_id = store.create("test", "gpt-4o")
+    store.append(session_id, 0, "user", "first")
+    with pytest.raises(sqlite3.IntegrityError):
+        store.append(session_id, 0, "user", "again")
+
+
+def test_save_state_round_trips(store):
+    session_id = store.create("test", "gpt-4o", context="scenario")
+    store.save_state(session_id, {"conceded": True, "hints_used": 2}, model="gpt-4o-mini")
+
+    session = store.session(session_id)
+    assert session["state"] == {"conceded": True, "hints_used": 2}
+    assert session["model"] == "gpt-4o-mini"
+    assert session["context"] == "scenario"
+    assert store.session("missing") is None
+
+
+def _debate(store):
+    bot = PersonaBot(PERSONA, "gpt-4o", store=store)
+    bot.open_conversation()
+    bot.engine.replies += ["Nonsense.", "Here is a hint.", "Still no."]
+    bot.get_response("Consider the data.")
+    bot.get_response("", is_hint_request=True)
+    bot.get_response("And the control group?")
+    return bot
+
+
+def test_resume_rebuilds_the_session(store, engine):
+    bot = _debate(store)
+
+    resumed = PersonaBot.resume(PERSONA, store, bot.session_id)
+
+    assert resumed.next_seq == bot.next_seq == 8
+    assert resumed.hints_used == 1
+    assert resumed.transcript.api_messages() == bot.transcript.api_messages()
+    assert resumed.transcript.display_messages() == bot.transcript.display_messages()
+    assert resumed.user_turns() == 2
+
+
+def test_resume_keeps_the_stored_model(store, engine):
+    bot = PersonaBot(PERSONA, "gpt-4o-mini", store=store)
+    bot.open_conversation()
+
+    resumed = PersonaBot.resume(PERSONA, store, bot.session_id)
+    resumed.get_response("A point.")
+    assert resumed.model == "gpt-4o-mini"
+    assert engine.requests[-1]["model"] == "gpt-4o-mini"
+    assert store.session(bot.session_id)["model"] == "gpt-4o-mini"
+
+
+def test_resumed_bot_appends_after_the_stored_turns(store, engine):
+    bot = _debate(store)
+    resumed = PersonaBot.resume(PERSONA, store, bot.session_id)
+
+    engine.replies.append("Fine, maybe.")
+    assert resumed.get_response("One more point.") == "Fine, maybe."
+    assert [t["content"] for t in store.turns(bot.session_id, 8)] == ["One more point.", "Fine, maybe."]
+
+
+def test_resume_refuses_another_persona_or_context(store, engine):
+    bot = _debate(store)
+    other = Persona(key="other", name="Other", prompt="", opening_trigger="")
+
+    assert PersonaBot.resume(other, store, bot.session_id) is None
+    assert PersonaBot.resume(PERSONA, store, bot.session_id, context="scenario") is None
+    assert PersonaBot.resume(PERSONA, store, "missing") is None
+
+
+def test_failed_turns_are_not_stored(store, engine):
+    bot = PersonaBot(PERSONA, "gpt-4o", store=store)
+    bot.open_conversation()
+
+    def fail(**params):
+        raise RuntimeError("down")
+    engine.complete = fail
+
+    assert bot.get_response("Hello?").startswith("❌ API Error")
+    assert len(store.turns(bot.session_id)) == 2
+    assert PersonaBot.resume(PERSONA, store, bot.session_id).next_seq == 2
+
+
+def test_live_bot_is_shared_until_released(store, engine):
+    bot = _debate(store)
+
+    assert store.live_bot(bot.session_id) is bot
+    session_id = bot.session_id
+    store._live.clear()
+    del bot
+    gc.collect()
+    assert store.live_bot(session_id) is None